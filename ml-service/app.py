@@ -15,7 +15,7 @@ from database_service import DatabaseService
 from error_handler import (
     MLServiceError, PredictionError, ModelError, DataError, DatabaseError,
     handle_ml_errors, handle_prediction_errors, create_error_response,
-    log_error_with_context
+    log_error_with_context, enable_queued_logging, set_request_id
 )
 
 # Load environment variables
@@ -30,6 +30,7 @@ logging.basicConfig(
     level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+enable_queued_logging()
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -51,6 +52,11 @@ except Exception as e:
     prediction_service = None
     database_service = None
 
+@app.before_request
+def clear_request_id():
+    """Don't let error responses pick up the id of a previous request on this thread"""
+    set_request_id(None)
+
 @app.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -141,6 +147,7 @@ def train_model():
 def predict_marks():
     """Predict university exam marks for a student with comprehensive error handling"""
     request_id = f"pred_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
+    set_request_id(request_id)
     
     if not prediction_service or not database_service:
         raise MLServiceError('Prediction or database service not available', 'SERVICE_UNAVAILABLE')
@@ -6,7 +6,7 @@ Handles university exam predictions based on Series Test and Lab Internal marks
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import KFold, train_test_split, cross_validate
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import xgboost as xgb
 import joblib
@@ -18,6 +18,48 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Internal assessment columns and the weights mapping them, in one matmul, to
+# series_average, total_internal_score and performance_trend
+_INTERNAL_COLUMNS = ['series_test_1', 'series_test_2', 'lab_internal']
+_FEATURE_WEIGHTS = np.array([
+    [0.5, 1.0, -1.0],
+    [0.5, 1.0, 1.0],
+    [0.0, 1.0, 0.0]
+])
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; engineer_features falls back to the matmul
+    njit = None
+
+if njit is not None:
+    @njit(fastmath=True, cache=True)
+    def _engineer_kernel(raw, out):
+        """Fused loop computing the _FEATURE_WEIGHTS product without temporaries"""
+        for i in range(raw.shape[0]):
+            s1 = raw[i, 0]
+            s2 = raw[i, 1]
+            out[i, 0] = (s1 + s2) * 0.5
+            out[i, 1] = s1 + s2 + raw[i, 2]
+            out[i, 2] = s2 - s1
+else:
+    _engineer_kernel = None
+
+def _load_joblib(path: str, mmap_mode: Optional[str] = None) -> Any:
+    """
+    joblib.load that records the model's size for validate_model_health. Models are
+    saved uncompressed, so the file size stands in for the serialized model size.
+    """
+    loaded = joblib.load(path, mmap_mode=mmap_mode)
+    model = loaded.get('model') if isinstance(loaded, dict) else loaded
+    try:
+        # Deliberate stand-in for len(pickle.dumps(model)): save_model writes with
+        # compress=0, so the file size matches the serialized size without re-pickling
+        model._cached_size_bytes = os.path.getsize(path)
+    except (AttributeError, OSError):
+        pass  # size is informational only
+    return loaded
+
 class PredictionService:
     """
     ML service for predicting university exam marks based on internal assessments
@@ -37,6 +79,11 @@ class PredictionService:
             'attendance_percentage'  # Added attendance feature
         ]
         
+        # Feature matrix, target and column order of each subject model trained through
+        # train_subject_model/retrain_with, kept for the life of the service so retrain_with
+        # can append rows without rebuilding the full frame; plain train_model keeps nothing
+        self._training_matrices = {}
+        
         # Ensure model directory exists
         os.makedirs(model_path, exist_ok=True)
         
@@ -54,62 +101,51 @@ class PredictionService:
         Returns:
             Tuple of (features_df, target_series)
         """
-        training_records = []
-        
-        # Group marks by student and subject
-        student_subject_marks = {}
-        for mark in marks_data:
-            key = (mark['student_id'], mark['subject_id'])
-            if key not in student_subject_marks:
-                student_subject_marks[key] = {
-                    'student_id': mark['student_id'],
-                    'subject_id': mark['subject_id'],
-                    'subject_type': mark.get('subject_type', 'theory'),
-                    'semester': mark.get('semester', 1),
-                    'marks': {}
-                }
-            
-            exam_type = mark['exam_type']
-            percentage = (mark['marks_obtained'] / mark['max_marks']) * 100
-            student_subject_marks[key]['marks'][exam_type] = percentage
+        internal_exams = ['series_test_1', 'series_test_2', 'lab_internal']
+        keys = ['student_id', 'subject_id']
         
-        # Create training records for students with university marks
-        for key, data in student_subject_marks.items():
-            marks = data['marks']
-            
-            # Only include records with university marks (target) and at least 2 internal assessments
-            if 'university' in marks:
-                internal_count = sum(1 for exam in ['series_test_1', 'series_test_2', 'lab_internal'] 
-                                   if exam in marks)
-                
-                if internal_count >= 2:
-                    # Fill missing internal marks with average of available ones
-                    internal_marks = [marks.get(exam, 0) for exam in ['series_test_1', 'series_test_2', 'lab_internal']]
-                    available_internals = [m for m in internal_marks if m > 0]
-                    avg_internal = np.mean(available_internals) if available_internals else 0
-                    
-                    # Fill missing values with average
-                    series_1 = marks.get('series_test_1', avg_internal)
-                    series_2 = marks.get('series_test_2', avg_internal)
-                    lab_internal = marks.get('lab_internal', avg_internal)
-                    
-                    record = {
-                        'student_id': data['student_id'],
-                        'subject_id': data['subject_id'],
-                        'series_test_1_percentage': series_1,
-                        'series_test_2_percentage': series_2,
-                        'lab_internal_percentage': lab_internal,
-                        'average_internal_percentage': np.mean([series_1, series_2, lab_internal]),
-                        'subject_type_encoded': 1 if data['subject_type'] == 'lab' else 0,
-                        'semester': data['semester'],
-                        'university_percentage': marks['university']
-                    }
-                    training_records.append(record)
-        
-        if not training_records:
+        df = pd.DataFrame(marks_data, columns=keys + ['exam_type', 'marks_obtained', 'max_marks', 'subject_type', 'semester'])
+        df['subject_type'] = df['subject_type'].fillna('theory')
+        df['semester'] = df['semester'].fillna(1)
+        if df['semester'].dtype.kind == 'f' and (df['semester'] % 1 == 0).all():
+            df['semester'] = df['semester'].astype(np.int64)  # undo the float upcast from missing keys
+        df['percentage'] = (df['marks_obtained'] / df['max_marks']) * 100
+        
+        # Group marks by student and subject (first-seen order); a repeated exam keeps its last mark
+        groups = df.groupby(keys, sort=False)[['subject_type', 'semester']].first()
+        marks = (df.pivot_table(index=keys, columns='exam_type', values='percentage', aggfunc='last')
+                   .reindex(index=groups.index, columns=internal_exams + ['university']))
+        
+        # Only include records with university marks (target) and at least 2 internal assessments
+        internal = marks[internal_exams].to_numpy(dtype=np.float64)
+        present = ~np.isnan(internal)
+        keep = marks['university'].notna().to_numpy() & (present.sum(axis=1) >= 2)
+        
+        if not keep.any():
             raise ValueError("No valid training data found. Need students with university marks and internal assessments.")
         
-        df = pd.DataFrame(training_records)
+        internal = internal[keep]
+        present = present[keep]
+        
+        # Fill missing internal marks with average of available (positive) ones
+        positive = present & (internal > 0)
+        n_positive = positive.sum(axis=1)
+        avg_internal = np.divide(np.where(positive, internal, 0).sum(axis=1), n_positive,
+                                 out=np.zeros(len(internal)), where=n_positive > 0)
+        internal = np.where(present, internal, avg_internal[:, None])
+        
+        groups = groups[keep].reset_index()
+        df = pd.DataFrame({
+            'student_id': groups['student_id'],
+            'subject_id': groups['subject_id'],
+            'series_test_1_percentage': internal[:, 0],
+            'series_test_2_percentage': internal[:, 1],
+            'lab_internal_percentage': internal[:, 2],
+            'average_internal_percentage': internal.sum(axis=1) / 3,
+            'subject_type_encoded': (groups['subject_type'] == 'lab').astype(np.int64),
+            'semester': groups['semester'],
+            'university_percentage': marks['university'].to_numpy()[keep]
+        })
         
         # Features and target
         X = df[self.feature_columns]
@@ -240,35 +276,7 @@ class PredictionService:
         """
         try:
             # Get appropriate model (prioritize production models)
-            model_key = None
-            model = None
-            
-            # Try production models first
-            if 'production_best' in self.models:
-                model_key = 'production_best'
-                model = self.models['production_best']
-            elif any(key.startswith('production_') for key in self.models.keys()):
-                # Use any available production model
-                production_keys = [k for k in self.models.keys() if k.startswith('production_')]
-                model_key = production_keys[0]
-                model = self.models[model_key]
-            else:
-                # Fallback to subject-specific or general models
-                subject_key = f"subject_{subject_id}" if subject_id else "general"
-                model = self.models.get(subject_key)
-                model_key = subject_key
-                
-                if model is None:
-                    # Try to load model from disk
-                    model_filename = f"{subject_key}_model_{self.model_version}.joblib"
-                    model_filepath = os.path.join(self.model_path, model_filename)
-                    
-                    if os.path.exists(model_filepath):
-                        model = joblib.load(model_filepath)
-                        self.models[subject_key] = model
-                        model_key = subject_key
-                    else:
-                        raise ValueError(f"No trained model found. Please train a model first.")
+            model_key, model = self._select_model(subject_id)
             
             # Prepare features
             features = self._prepare_prediction_features(student_data)
@@ -303,12 +311,50 @@ class PredictionService:
                 'predicted_at': datetime.now().isoformat()
             }
     
-    def _prepare_prediction_features(self, student_data: Dict) -> List[float]:
+    def _select_model(self, subject_id: Optional[int] = None) -> Tuple[str, Any]:
+        """
+        Pick the model used for prediction, loading it from disk if needed
+        
+        Args:
+            subject_id: Optional subject ID for subject-specific prediction
+            
+        Returns:
+            Tuple of (model_key, model)
+        """
+        # Try production models first
+        if 'production_best' in self.models:
+            return 'production_best', self.models['production_best']
+        
+        production_keys = [k for k in self.models.keys() if k.startswith('production_')]
+        if production_keys:
+            # Use any available production model
+            return production_keys[0], self.models[production_keys[0]]
+        
+        # Fallback to subject-specific or general models
+        subject_key = f"subject_{subject_id}" if subject_id else "general"
+        model = self.models.get(subject_key)
+        
+        if model is None:
+            # Try to load model from disk
+            model_filename = f"{subject_key}_model_{self.model_version}.joblib"
+            model_filepath = os.path.join(self.model_path, model_filename)
+            
+            if os.path.exists(model_filepath):
+                model = _load_joblib(model_filepath)
+                self.models[subject_key] = model
+            else:
+                raise ValueError(f"No trained model found. Please train a model first.")
+        
+        return subject_key, model
+    
+    def _prepare_prediction_features(self, student_data: Dict,
+                                     subject_type_encoded: Optional[int] = None) -> List[float]:
         """
         Prepare feature vector for prediction
         
         Args:
             student_data: Student's marks and subject information
+            subject_type_encoded: Precomputed lab flag (batch callers encode the column at once)
             
         Returns:
             Feature vector for model input
@@ -335,12 +381,15 @@ class PredictionService:
         # Recalculate average with filled values
         avg_internal = np.mean([series_1, series_2, lab_internal])
         
+        if subject_type_encoded is None:
+            subject_type_encoded = 1 if student_data.get('subject_type') == 'lab' else 0
+        
         features = [
             series_1,
             series_2,
             lab_internal,
             avg_internal,
-            1 if student_data.get('subject_type') == 'lab' else 0,
+            subject_type_encoded,
             student_data.get('semester', 1)
         ]
         
@@ -392,7 +441,7 @@ class PredictionService:
             
             if os.path.exists(best_model_path):
                 try:
-                    model_package = joblib.load(best_model_path)
+                    model_package = _load_joblib(best_model_path)
                     
                     # Validate model package
                     if isinstance(model_package, dict) and 'model' in model_package:
@@ -423,7 +472,7 @@ class PredictionService:
                     if filename.startswith('production_') and filename.endswith('.joblib'):
                         try:
                             model_path = os.path.join(self.model_path, filename)
-                            model_package = joblib.load(model_path)
+                            model_package = _load_joblib(model_path)
                             
                             if isinstance(model_package, dict) and 'model' in model_package:
                                 model_key = f"production_{model_package.get('model_name', 'unknown')}"
@@ -451,7 +500,7 @@ class PredictionService:
                         model_filepath = os.path.join(self.model_path, filename)
                         
                         try:
-                            model = joblib.load(model_filepath)
+                            model = _load_joblib(model_filepath)
                             self.models[model_key] = model
                             logger.info(f"Loaded model: {model_key}")
                         except Exception as e:
@@ -484,22 +533,78 @@ class PredictionService:
         Returns:
             List of prediction results
         """
-        results = []
+        if not students_data:
+            return []
         
-        for student_data in students_data:
+        try:
+            model_key, model = self._select_model(subject_id)
+        except Exception as e:
+            logger.error(f"Prediction failed: {str(e)}")
+            predicted_at = datetime.now().isoformat()
+            return [{
+                'success': False,
+                'error': str(e),
+                'predicted_at': predicted_at,
+                'student_id': student_data.get('student_id'),
+                'subject_id': student_data.get('subject_id')
+            } for student_data in students_data]
+        
+        results = [None] * len(students_data)
+        rows = []
+        features_list = []
+        
+        # Encode subject types for the whole batch in one comparison
+        subject_types = np.fromiter((student_data.get('subject_type') for student_data in students_data),
+                                    dtype=object, count=len(students_data))
+        subject_type_encoded = (subject_types == 'lab').astype(np.int8).tolist()
+        
+        # Build every feature vector first so the model scores the whole batch in one call
+        for i, student_data in enumerate(students_data):
             try:
-                prediction = self.predict_university_marks(student_data, subject_id)
-                prediction['student_id'] = student_data.get('student_id')
-                prediction['subject_id'] = student_data.get('subject_id')
-                results.append(prediction)
+                features_list.append(self._prepare_prediction_features(student_data, subject_type_encoded[i]))
+                rows.append(i)
             except Exception as e:
-                results.append({
+                results[i] = {
                     'success': False,
                     'error': str(e),
                     'student_id': student_data.get('student_id'),
                     'subject_id': student_data.get('subject_id'),
                     'predicted_at': datetime.now().isoformat()
-                })
+                }
+        
+        if rows:
+            try:
+                predictions = model.predict(features_list)
+            except Exception:
+                # A row the model rejects would fail the whole batch; score one by one instead
+                for i in rows:
+                    prediction = self.predict_university_marks(students_data[i], subject_id)
+                    prediction['student_id'] = students_data[i].get('student_id')
+                    prediction['subject_id'] = students_data[i].get('subject_id')
+                    results[i] = prediction
+                return results
+            
+            predicted_at = datetime.now().isoformat()
+            for i, features, prediction in zip(rows, features_list, predictions):
+                student_data = students_data[i]
+                confidence = self._calculate_confidence(student_data, features)
+                
+                # Ensure prediction is within valid range
+                prediction = max(0, min(100, prediction))
+                
+                results[i] = {
+                    'success': True,
+                    'predicted_marks': round(prediction, 2),
+                    'confidence_score': round(confidence, 2),
+                    'input_features': dict(zip(self.feature_columns, features)),
+                    'model_version': self.model_version,
+                    'model_used': model_key,
+                    'predicted_at': predicted_at,
+                    'student_id': student_data.get('student_id'),
+                    'subject_id': student_data.get('subject_id')
+                }
+            
+            logger.info(f"Batch prediction made for {len(rows)} students with {model_key}")
         
         return results
 
@@ -527,6 +632,11 @@ class PredictionService:
         # Remove any remaining NaN values
         processed_data = processed_data.dropna()
         
+        # Marks and percentages fit comfortably in float32, which is also the dtype
+        # the tree estimators convert X to internally, so downcast once at ingest
+        present_columns = [col for col in numeric_columns if col in processed_data.columns]
+        processed_data[present_columns] = processed_data[present_columns].astype(np.float32)
+        
         return processed_data
     
     def engineer_features(self, data: pd.DataFrame) -> pd.DataFrame:
@@ -541,6 +651,24 @@ class PredictionService:
         """
         features = data.copy()
         
+        # Fast path: all internal columns present, numeric and complete
+        if all(col in features.columns for col in _INTERNAL_COLUMNS):
+            internal = features[_INTERNAL_COLUMNS]
+            if all(pd.api.types.is_numeric_dtype(dtype) for dtype in internal.dtypes):
+                raw = internal.to_numpy(dtype=np.float64)
+                if not np.isnan(raw).any():
+                    if _engineer_kernel is not None:
+                        engineered = np.empty_like(raw)
+                        _engineer_kernel(raw, engineered)
+                    else:
+                        engineered = raw @ _FEATURE_WEIGHTS
+                    # Keep the dtypes the column-wise pandas arithmetic would produce
+                    sum_dtype = np.result_type(*internal.dtypes)
+                    features['series_average'] = engineered[:, 0].astype(np.result_type(sum_dtype, 0.5))
+                    features['total_internal_score'] = engineered[:, 1].astype(sum_dtype)
+                    features['performance_trend'] = engineered[:, 2].astype(sum_dtype)
+                    return features
+        
         # Calculate series average
         if 'series_test_1' in features.columns and 'series_test_2' in features.columns:
             features['series_average'] = (features['series_test_1'] + features['series_test_2']) / 2
@@ -557,6 +685,18 @@ class PredictionService:
         
         return features
     
+    def build_estimator(self, random_state: int = 42) -> RandomForestRegressor:
+        """
+        Create the unfitted scikit-learn estimator used by train_model
+        
+        Args:
+            random_state: Random seed for the estimator
+            
+        Returns:
+            Unfitted estimator, suitable for cross_validate and clone
+        """
+        return RandomForestRegressor(n_estimators=100, random_state=random_state)
+    
     def train_model(self, X: pd.DataFrame, y: pd.Series) -> Tuple[Any, Dict]:
         """
         Train ML model with features and target
@@ -568,14 +708,11 @@ class PredictionService:
         Returns:
             Tuple of (trained_model, metrics)
         """
-        from sklearn.model_selection import train_test_split
-        from sklearn.ensemble import RandomForestRegressor
-        
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         # Train model
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model = self.build_estimator()
         model.fit(X_train, y_train)
         
         # Calculate metrics
@@ -590,14 +727,54 @@ class PredictionService:
         
         return model, metrics
     
+    def _train_and_store(self, X: pd.DataFrame, y: pd.Series, subject_id: Any) -> Tuple[Any, Dict]:
+        """Train a subject model, serve it and keep its training matrix for retrain_with"""
+        model, metrics = self.train_model(X, y)
+        self._training_matrices[subject_id] = (X.to_numpy(), np.asarray(y), list(X.columns))
+        self.models[f'subject_{subject_id}'] = model
+        return model, metrics
+    
+    def retrain_with(self, new_data: pd.DataFrame, subject_id: Any) -> Tuple[Any, Dict]:
+        """
+        Retrain a subject model on its previous training set plus new rows
+        
+        Args:
+            new_data: Raw DataFrame with the new rows, including university_marks
+            subject_id: Subject previously trained with train_subject_model
+            
+        Returns:
+            Tuple of (trained_model, metrics)
+        """
+        if subject_id not in self._training_matrices:
+            raise ValueError("No training data cached. Please train a model first.")
+        
+        X_cached, y_cached, columns = self._training_matrices[subject_id]
+        
+        # Only the new rows are preprocessed and engineered; stack them onto the cached matrix
+        new_data = self.preprocess_data(new_data)
+        new_features = self.engineer_features(new_data)
+        missing_columns = [col for col in columns if col not in new_features.columns]
+        extra_columns = [col for col in new_features.columns
+                         if col not in columns and col != 'university_marks']
+        if missing_columns or extra_columns:
+            raise ValueError(f"New data columns do not match the training data: "
+                             f"missing {missing_columns}, unexpected {extra_columns}")
+        
+        X_combined = np.concatenate([X_cached, new_features[columns].to_numpy(dtype=X_cached.dtype)])
+        y_combined = np.concatenate([y_cached, new_data['university_marks'].to_numpy()])
+        
+        return self._train_and_store(pd.DataFrame(X_combined, columns=columns), pd.Series(y_combined), subject_id)
+    
     def _calculate_accuracy_within_threshold(self, y_true, y_pred, threshold_percent):
         """Calculate percentage of predictions within threshold"""
-        percentage_errors = np.abs((y_pred - y_true) / y_true) * 100
-        return np.mean(percentage_errors <= threshold_percent)
+        y_true = np.asarray(y_true, dtype=np.float64)
+        y_pred = np.asarray(y_pred, dtype=np.float64)
+        # |pred - true| <= t% of |true|, without materializing the percentage errors
+        return np.mean(np.abs(y_pred - y_true) <= (threshold_percent / 100) * np.abs(y_true))
     
     def train_subject_model(self, data: pd.DataFrame, subject_id: int) -> Any:
         """
-        Train subject-specific model
+        Train subject-specific model, keeping its feature matrix in memory for retrain_with
         
         Args:
             data: Training data for specific subject
@@ -615,11 +792,8 @@ class PredictionService:
         X = features[feature_cols]
         y = features['university_marks'] if 'university_marks' in features.columns else features.iloc[:, -1]
         
-        # Train model
-        model, _ = self.train_model(X, y)
-        
-        # Store model
-        self.models[f'subject_{subject_id}'] = model
+        # Train and store model
+        model, _ = self._train_and_store(X, y, subject_id)
         
         return model
     
@@ -639,19 +813,24 @@ class PredictionService:
             'saved_at': datetime.now().isoformat()
         }
         
-        joblib.dump(model_data, path)
+        # Uncompressed with pickle protocol 5 so large arrays are written as
+        # raw buffers and can be memory-mapped back by load_model(path, mmap_mode='r')
+        joblib.dump(model_data, path, compress=0, protocol=5)
     
-    def load_model(self, path: str) -> Tuple[Any, Dict]:
+    def load_model(self, path: str, mmap_mode: Optional[str] = None) -> Tuple[Any, Dict]:
         """
         Load model from disk
         
         Args:
             path: File path to load model from
+            mmap_mode: None (default) loads everything into memory; pass 'r' to
+                memory-map the model's arrays read-only, which leaves them
+                non-writable and keeps the file open
             
         Returns:
             Tuple of (model, metrics)
         """
-        model_data = joblib.load(path)
+        model_data = _load_joblib(path, mmap_mode=mmap_mode)
         return model_data['model'], model_data['metrics']
     
     def cross_validate_model(self, X: pd.DataFrame, y: pd.Series, cv_folds: int = 5) -> Dict:
@@ -666,15 +845,22 @@ class PredictionService:
         Returns:
             Cross-validation scores
         """
-        from sklearn.model_selection import cross_val_score
-        from sklearn.ensemble import RandomForestRegressor
+        model = self.build_estimator()
         
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        # Convert once so each fold is a plain ndarray take rather than a DataFrame
+        # iloc copy; float32 is what the tree estimators use internally anyway
+        X_np = np.ascontiguousarray(X, dtype=np.float32)
+        y_np = np.asarray(y, dtype=np.float64)
         
-        # Calculate CV scores
-        mse_scores = -cross_val_score(model, X, y, cv=cv_folds, scoring='neg_mean_squared_error')
-        mae_scores = -cross_val_score(model, X, y, cv=cv_folds, scoring='neg_mean_absolute_error')
-        r2_scores = cross_val_score(model, X, y, cv=cv_folds, scoring='r2')
+        # Calculate all CV scores from one set of fits, running folds in parallel
+        scores = cross_validate(
+            model, X_np, y_np, cv=KFold(n_splits=cv_folds),
+            scoring=('neg_mean_squared_error', 'neg_mean_absolute_error', 'r2'),
+            n_jobs=-1
+        )
+        mse_scores = -scores['test_neg_mean_squared_error']
+        mae_scores = -scores['test_neg_mean_absolute_error']
+        r2_scores = scores['test_r2']
         
         return {
             'cv_mse_scores': mse_scores.tolist(),
@@ -713,22 +899,55 @@ class PredictionService:
         Returns:
             DataFrame containing outlier records
         """
-        outliers = pd.DataFrame()
-        
         numeric_columns = data.select_dtypes(include=[np.number]).columns
+        if len(numeric_columns) == 0 or data.empty:
+            return data.iloc[0:0]
         
-        for col in numeric_columns:
-            Q1 = data[col].quantile(0.25)
-            Q3 = data[col].quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
+        # Bounds for every numeric column at once; NaNs are ignored like Series.quantile
+        values = data[numeric_columns].to_numpy(dtype=np.float64)
+        Q1, Q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+        IQR = Q3 - Q1
+        
+        lower_bound = Q1 - 1.5 * IQR
+        upper_bound = Q3 + 1.5 * IQR
+        
+        # A record is an outlier if any of its numeric values falls outside its column's bounds
+        outlier_mask = ((values < lower_bound) | (values > upper_bound)).any(axis=1)
+        
+        return data[outlier_mask]
+    
+    def predict_frame(self, data: pd.DataFrame, subject_id: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Predict university marks for every row of a DataFrame in one model call
+        
+        Args:
+            data: Raw input DataFrame (one row per student)
+            subject_id: Optional subject ID for subject-specific prediction
             
-            col_outliers = data[(data[col] < lower_bound) | (data[col] > upper_bound)]
-            outliers = pd.concat([outliers, col_outliers]).drop_duplicates()
+        Returns:
+            DataFrame with predicted_marks and confidence_score, aligned to data's index
+        """
+        # Same model resolution as predict_university_marks and batch_predict
+        model_key, model = self._select_model(subject_id)
+        
+        features = self.engineer_features(data)
+        expected_columns = list(getattr(model, 'feature_names_in_', []))
+        if expected_columns and all(col in features.columns for col in expected_columns):
+            X = features[expected_columns]
+        elif not expected_columns and not model_key.startswith('production_'):
+            X = features.drop(columns=['university_marks'], errors='ignore')
+        else:
+            # Production models use self.feature_columns; build the same vectors batch_predict does
+            vectors = [self._prepare_prediction_features({'marks': record, **record})
+                       for record in data.to_dict('records')]
+            X = pd.DataFrame(vectors, columns=expected_columns or None, index=data.index)
         
-        return outliers
+        predictions, confidence_scores = self.predict_with_confidence(model, X)
+        
+        return pd.DataFrame({
+            'predicted_marks': np.clip(predictions, 0, 100),
+            'confidence_score': confidence_scores
+        }, index=data.index)
     
     def predict_with_confidence(self, model: Any, X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
         """
@@ -741,18 +960,38 @@ class PredictionService:
         Returns:
             Tuple of (predictions, confidence_scores)
         """
-        predictions = model.predict(X)
-        
         # Calculate confidence based on prediction variance (for ensemble models)
-        if hasattr(model, 'estimators_'):
-            # For ensemble models, use prediction variance
+        if isinstance(model, RandomForestRegressor):
+            # Validate X once with the checks RandomForestRegressor.predict applies (feature
+            # names and count, finiteness) and convert it to the trees' float32 so each
+            # tree.predict below is a no-copy pass; then score every tree into one
+            # (n_trees, n_samples) matrix, whose mean over trees is the forest's prediction
+            if hasattr(model, 'feature_names_in_'):
+                expected_columns = list(model.feature_names_in_)
+                columns = list(X.columns) if isinstance(X, pd.DataFrame) else None
+                if columns != expected_columns:
+                    raise ValueError(f"Feature names do not match those seen at fit time: "
+                                     f"expected {expected_columns}, got {columns}")
+            X_checked = np.ascontiguousarray(X, dtype=np.float32)
+            if X_checked.ndim != 2 or X_checked.shape[1] != model.n_features_in_:
+                raise ValueError(f"X has shape {X_checked.shape}, but the model expects "
+                                 f"{model.n_features_in_} features")
+            if not np.isfinite(X_checked).all():
+                raise ValueError("Input X contains NaN or infinity")
+            individual_predictions = np.stack([tree.predict(X_checked) for tree in model.estimators_])
+            predictions = individual_predictions.mean(axis=0)
+        elif hasattr(model, 'estimators_'):
+            predictions = model.predict(X)
             individual_predictions = np.array([tree.predict(X) for tree in model.estimators_])
-            prediction_std = np.std(individual_predictions, axis=0)
-            # Convert std to confidence (inverse relationship)
-            max_std = np.max(prediction_std) if np.max(prediction_std) > 0 else 1
-            confidence_scores = 1 - (prediction_std / max_std)
         else:
+            predictions = model.predict(X)
             # For non-ensemble models, use a default confidence
-            confidence_scores = np.full(len(predictions), 0.8)
+            return predictions, np.full(len(predictions), 0.8)
+        
+        # For ensemble models, use the spread of the trees relative to each prediction,
+        # so a row's confidence does not depend on the other rows in the batch
+        prediction_std = np.std(individual_predictions, axis=0)
+        relative_std = prediction_std / (np.abs(predictions) + 1e-9)
+        confidence_scores = 1 - np.clip(relative_std, 0, 1)
         
         return predictions, confidence_scores
\ No newline at end of file
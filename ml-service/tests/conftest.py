@@ -5,14 +5,14 @@ Pytest configuration and fixtures for ML service tests
 import pytest
 import numpy as np
 import pandas as pd
-import tempfile
-import shutil
 import os
 import sys
 from unittest.mock import Mock, patch
 
-# Add the parent directory to the path to import modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the parent directory to the path to import modules (once per session)
+_ML_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ML_SERVICE_DIR not in sys.path:
+    sys.path.append(_ML_SERVICE_DIR)
 
 @pytest.fixture
 def sample_student_data():
@@ -62,11 +62,9 @@ def sample_prediction_input():
     })
 
 @pytest.fixture
-def temp_model_dir():
-    """Create a temporary directory for model files"""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir)
+def temp_model_dir(tmp_path):
+    """Temporary directory for model files (cleaned up by pytest)"""
+    return str(tmp_path)
 
 @pytest.fixture
 def mock_database_connection():
@@ -1,6 +1,7 @@
 import pytest
 import numpy as np
 import pandas as pd
+import pickle
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
@@ -9,10 +10,10 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.error_handler import (
-    MLServiceError, PredictionError, ModelError, DataError, DatabaseError,
+    MLServiceError, PredictionError, ModelError, DataError, DatabaseError, ExpectedFallback,
     handle_ml_errors, handle_prediction_errors, get_fallback_prediction,
-    validate_data_integrity, safe_numeric_conversion, handle_database_errors,
-    create_comprehensive_error_response, get_recovery_suggestions,
+    validate_data_integrity, validate_data_integrity_batch, safe_numeric_conversion, handle_database_errors,
+    build_error_response, create_comprehensive_error_response, get_recovery_suggestions,
     validate_model_health, graceful_degradation, retry_with_backoff
 )
 
@@ -32,6 +33,35 @@ class TestMLServiceErrorHandling:
         assert error.details["field"] == "test_field"
         assert error.timestamp is not None
 
+    def test_ml_service_error_pickle_round_trip(self):
+        """Test errors keep code, details and creation time through pickle and copy"""
+        import copy
+        import pickle
+        
+        errors = [
+            MLServiceError("Custom failure", "CUSTOM_CODE", {"field": "value"}),
+            PredictionError("Prediction failed", {"model": "test_model"}),
+            ExpectedFallback()
+        ]
+        
+        for error in errors:
+            for restored in (pickle.loads(pickle.dumps(error)), copy.copy(error)):
+                assert type(restored) is type(error)
+                assert restored.message == error.message
+                assert restored.error_code == error.error_code
+                assert restored.details == error.details
+                assert restored.timestamp == error.timestamp
+
+    def test_ml_service_error_timestamp_assignment(self):
+        """Test an assigned timestamp replaces the creation time and survives pickling"""
+        import pickle
+        
+        error = DataError("Invalid input data")
+        error.timestamp = "2024-01-01T00:00:00"
+        
+        assert error.timestamp == "2024-01-01T00:00:00"
+        assert pickle.loads(pickle.dumps(error)).timestamp == "2024-01-01T00:00:00"
+
     def test_prediction_error_inheritance(self):
         """Test PredictionError inherits from MLServiceError"""
         error = PredictionError("Prediction failed", {"model": "test_model"})
@@ -52,6 +82,20 @@ class TestMLServiceErrorHandling:
         assert exc_info.value.error_code == "UNEXPECTED_ERROR"
         assert "Test error" in exc_info.value.message
 
+    def test_handle_ml_errors_trims_wrapper_frame(self):
+        """Test the chained original error's traceback starts in the wrapped function"""
+        @handle_ml_errors
+        def failing_function():
+            raise ValueError("Test error")
+        
+        with pytest.raises(MLServiceError) as exc_info:
+            failing_function()
+        
+        original = exc_info.value.__context__
+        assert isinstance(original, ValueError)
+        assert original.__traceback__.tb_frame.f_code.co_name == "failing_function"
+        assert exc_info.value.details['traceback'].count('File "') == 1
+
     def test_handle_prediction_errors_with_fallback(self):
         """Test prediction error handling with fallback"""
         @handle_prediction_errors
@@ -69,6 +113,19 @@ class TestMLServiceErrorHandling:
             assert result['prediction_method'] == 'fallback'
             assert result['predicted_marks'] == 65.0
 
+    def test_handle_prediction_errors_expected_fallback(self):
+        """Test expected fallbacks return the fallback prediction without logging"""
+        @handle_prediction_errors
+        def deferring_prediction():
+            raise ExpectedFallback()
+        
+        with patch('utils.error_handler.logger') as mock_logger:
+            result = deferring_prediction()
+        
+        assert result['prediction_method'] == 'fallback'
+        mock_logger.error.assert_not_called()
+        mock_logger.warning.assert_not_called()
+
     def test_fallback_prediction_with_data(self):
         """Test fallback prediction with student data"""
         student_data = {
@@ -128,6 +185,23 @@ class TestMLServiceErrorHandling:
         assert not is_valid
         assert any("missing values" in error for error in errors)
 
+    def test_validate_data_integrity_batch(self):
+        """Test batch data integrity validation matches per-array validation"""
+        arrays = [
+            np.array([1, 2, 3]),
+            np.array([1.0, np.nan]),
+            np.array([]),
+            np.array([[np.inf, 1.0], [2.0, 3.0]]),
+            np.array(['a', 'b']),
+            [1, None],
+            np.array([4.5, 5.5], dtype=np.float32)
+        ]
+        
+        results = validate_data_integrity_batch(arrays, "batch")
+        
+        assert results == [validate_data_integrity(data, "batch") for data in arrays]
+        assert validate_data_integrity_batch([]) == []
+
     def test_validate_data_integrity_edge_cases(self):
         """Test data integrity validation edge cases"""
         # None data
@@ -190,6 +264,19 @@ class TestMLServiceErrorHandling:
         assert response['error']['context'] == context
         assert 'recovery_suggestions' in response['error']
 
+    def test_build_error_response_without_recovery(self):
+        """Test the plain error response skips recovery suggestions"""
+        error = PredictionError("Model prediction failed")
+        
+        response = build_error_response(error, request_id="req_123")
+        unexpected = build_error_response(ValueError("boom"))
+        
+        assert response['error']['code'] == "PREDICTION_ERROR"
+        assert response['error']['request_id'] == "req_123"
+        assert 'recovery_suggestions' not in response['error']
+        assert unexpected['error']['code'] == "UNEXPECTED_ERROR"
+        assert 'recovery_suggestions' not in unexpected['error']
+
     def test_get_recovery_suggestions(self):
         """Test recovery suggestions generation"""
         # Prediction error suggestions
@@ -310,19 +397,60 @@ class TestMLServiceErrorHandling:
             # Verify logging was called (in actual implementation)
             # mock_log.assert_called_once()
 
+    def test_enable_queued_logging(self):
+        """Test records reach the original handlers through the queue listener"""
+        import atexit
+        import logging
+        from logging.handlers import QueueHandler
+        from utils.error_handler import enable_queued_logging
+
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        test_logger = logging.getLogger('test_enable_queued_logging')
+        test_logger.propagate = False
+        test_logger.addHandler(handler)
+
+        listener = enable_queued_logging(test_logger)
+        try:
+            assert isinstance(test_logger.handlers[0], QueueHandler)
+            assert enable_queued_logging(test_logger) is None
+            test_logger.error("queued %s", "message")
+        finally:
+            atexit.unregister(listener.stop)
+            listener.stop()
+            test_logger.handlers.clear()
+
+        assert [r.getMessage() for r in records] == ["queued message"]
+
     def test_model_memory_usage_warning(self):
         """Test model memory usage warnings"""
-        # Create a mock model that appears large
-        mock_model = Mock()
+        # Create a mock model that appears large and is otherwise healthy
+        mock_model = Mock(spec=['predict'])
         mock_model.predict.return_value = np.array([65.0])
+        mock_model._cached_size_bytes = 200 * 1024 * 1024  # 200MB
         
-        with patch('sys.getsizeof', return_value=200 * 1024 * 1024):  # 200MB
-            is_healthy, issues = validate_model_health(mock_model, np.array([[1, 2, 3]]))
-            
-            # Should still be healthy but with warnings
-            assert is_healthy
-            warning_issues = [issue for issue in issues if issue.startswith("Warning:")]
-            assert any("large" in issue.lower() for issue in warning_issues)
+        is_healthy, issues = validate_model_health(mock_model, np.array([[1, 2, 3]]))
+        
+        # Should still be healthy but with warnings
+        assert is_healthy
+        warning_issues = [issue for issue in issues if issue.startswith("Warning:")]
+        assert any("large" in issue.lower() for issue in warning_issues)
+
+    def test_model_size_measured_when_not_recorded(self):
+        """Test models that did not come through a loader get their size measured once"""
+        from sklearn.linear_model import LinearRegression
+        model = LinearRegression().fit(np.array([[1.0], [2.0], [3.0]]), np.array([2.0, 4.0, 6.0]))
+        expected_size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        
+        with patch('utils.error_handler.pickle.dumps', wraps=pickle.dumps) as dumps:
+            validate_model_health(model)
+            is_healthy, issues = validate_model_health(model)
+        
+        assert is_healthy
+        assert not any("large" in issue.lower() for issue in issues)
+        assert dumps.call_count == 1
+        assert model._cached_size_bytes == expected_size
 
     def test_prediction_consistency_check(self):
         """Test prediction consistency validation"""
@@ -356,6 +484,20 @@ class TestMLServiceErrorHandling:
         assert response['error']['request_id'] == request_id
         assert response['error']['code'] == "DATA_ERROR"
 
+    def test_error_response_with_context_request_id(self):
+        """Test error responses fall back to the request ID set for the current context"""
+        from utils.error_handler import set_request_id, _REQUEST_ID
+        
+        token = set_request_id("req_ctx")
+        try:
+            response = create_comprehensive_error_response(DataError("Invalid input data"))
+            explicit = create_comprehensive_error_response(DataError("Invalid input data"), request_id="req_arg")
+        finally:
+            _REQUEST_ID.reset(token)
+        
+        assert response['error']['request_id'] == "req_ctx"
+        assert explicit['error']['request_id'] == "req_arg"
+
     def test_comprehensive_error_handling_integration(self):
         """Test integration of multiple error handling components"""
         # Simulate a complete error handling flow
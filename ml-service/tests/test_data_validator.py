@@ -0,0 +1,182 @@
+"""
+Tests for DataValidator
+"""
+
+import json
+import pytest
+import sys
+import os
+
+# Add the parent directory to the path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_validator import (
+    DataValidator, _cached_prediction_request, _cached_toggle_request
+)
+
+class TestRequestValidation:
+    """Test request validators and their memoization"""
+
+    @pytest.fixture(autouse=True)
+    def clear_caches(self):
+        """Start every test with empty request caches"""
+        _cached_prediction_request.cache_clear()
+        _cached_toggle_request.cache_clear()
+
+    def test_prediction_request_returns_fresh_dict(self):
+        """Test cached results come back as independent, serializable dicts"""
+        request = {'student_id': 'abc', 'subject_id': 5}
+
+        first = DataValidator.validate_prediction_request(request)
+        first['errors'].append("mutated by caller")
+        second = DataValidator.validate_prediction_request(request)
+
+        assert type(second) is dict
+        assert isinstance(second['errors'], list)
+        assert not second['is_valid']
+        assert "mutated by caller" not in second['errors']
+        assert json.loads(json.dumps(second)) == second
+
+    def test_prediction_request_cache_hits(self):
+        """Test identical requests are validated once"""
+        request = {'student_id': 1, 'subject_id': 2, 'academic_year': 2019}
+
+        first = DataValidator.validate_prediction_request(request)
+        second = DataValidator.validate_prediction_request(dict(request))
+
+        assert first == second
+        assert first['warnings'] == ["Academic year 2019 seems unusual"]
+        info = _cached_prediction_request.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_prediction_request_missing_data(self):
+        """Test empty requests are rejected without touching the cache"""
+        result = DataValidator.validate_prediction_request({})
+
+        assert result == {'is_valid': False, 'errors': ["Request data is required"], 'warnings': []}
+        assert _cached_prediction_request.cache_info().misses == 0
+
+    def test_non_scalar_request_is_not_cached(self):
+        """Test requests with nested values are validated without caching"""
+        result = DataValidator.validate_prediction_request({'student_id': [1], 'subject_id': 2})
+
+        assert type(result) is dict
+        assert not result['is_valid']
+        assert _cached_prediction_request.cache_info().currsize == 0
+
+    def test_toggle_request_distinguishes_bool_from_int(self):
+        """Test True and 1 are cached as different requests"""
+        valid = DataValidator.validate_toggle_request({'is_visible': True})
+        invalid = DataValidator.validate_toggle_request({'is_visible': 1})
+
+        assert type(valid) is dict and valid['is_valid']
+        assert not invalid['is_valid']
+        assert invalid['errors'] == ["is_visible must be a boolean value"]
+        assert _cached_toggle_request.cache_info().currsize == 2
+
+    def test_validators_return_same_shape(self):
+        """Test all request validators return plain dicts with list fields"""
+        results = [
+            DataValidator.validate_prediction_request({'student_id': 1, 'subject_id': 2}),
+            DataValidator.validate_training_request({'subject_id': 2}),
+            DataValidator.validate_toggle_request({'is_visible': False})
+        ]
+
+        for result in results:
+            assert type(result) is dict
+            assert result['is_valid']
+            assert result['errors'] == [] and result['warnings'] == []
+
+def _mark(student_id, exam_type='series_test_1', marks_obtained=40, max_marks=50):
+    """One valid-by-default marks record"""
+    return {
+        'student_id': student_id,
+        'subject_id': 1,
+        'exam_type': exam_type,
+        'marks_obtained': marks_obtained,
+        'max_marks': max_marks
+    }
+
+class TestMarksValidation:
+    """Test marks data validation, early stopping and the fast path"""
+
+    @pytest.fixture
+    def mixed_marks(self):
+        """Records covering each per-record error and warning"""
+        return [
+            _mark(1),
+            {key: value for key, value in _mark(2).items() if key != 'max_marks'},
+            _mark(3, 'university', 'abc', 100),
+            _mark(4, 'lab_internal', -5),
+            _mark(5, 'university', 120, 100),
+            _mark(6, 'series_test_2', 10, 0),
+            _mark(7, 'university', 60, 80)
+        ]
+
+    def test_marks_messages(self, mixed_marks):
+        """Test messages, order and stats match the record-by-record implementation"""
+        result = DataValidator.validate_marks_data(mixed_marks)
+
+        assert not result['is_valid']
+        assert result['errors'] == [
+            "Record 1: Missing fields ['max_marks']",
+            "Record 2: Data type error - could not convert string to float: 'abc'",
+            "Record 3: Negative marks obtained: -5.0",
+            "Record 4: Marks obtained (120.0) exceeds max marks (100.0)",
+            "Record 5: Invalid max marks: 0.0",
+            "Record 5: Marks obtained (10.0) exceeds max marks (0.0)"
+        ]
+        assert result['warnings'] == [
+            "Record 5: Expected max marks 50 for series_test_2, got 0.0",
+            "Record 6: Expected max marks 100 for university exam, got 80.0"
+        ]
+        assert result['stats'] == {
+            'total_records': 7,
+            'unique_students': 5,
+            'unique_subjects': 1,
+            'exam_type_counts': {'series_test_1': 1, 'series_test_2': 1, 'lab_internal': 1, 'university': 2},
+            'missing_fields': ['max_marks']
+        }
+
+    def test_numeric_exam_type_next_to_missing_one(self):
+        """Test integer exam types are reported as str(value) even when another record lacks one"""
+        marks = [_mark(1, 5), {key: value for key, value in _mark(2).items() if key != 'exam_type'}]
+
+        result = DataValidator.validate_marks_data(marks)
+
+        assert result['stats']['exam_type_counts'] == {'5': 1}
+        assert result['stats']['missing_fields'] == ['exam_type']
+
+    def test_early_stop_keeps_first_errors(self):
+        """Test early_stop returns the first max_errors errors of the full result"""
+        marks = [_mark(i, marks_obtained=-1) for i in range(3000)]
+
+        full = DataValidator.validate_marks_data(marks)
+        stopped = DataValidator.validate_marks_data(marks, early_stop=True, max_errors=5)
+
+        assert len(full['errors']) == 3000
+        assert stopped['errors'] == full['errors'][:5]
+        assert not stopped['is_valid']
+        assert stopped['stats']['total_records'] == 3000
+
+    def test_early_stop_offsets_later_chunks(self):
+        """Test record numbers stay absolute when the first error is past the first chunk"""
+        marks = [_mark(i) for i in range(2000)] + [_mark(2000, marks_obtained=60), _mark(2001, marks_obtained=-2)]
+
+        result = DataValidator.validate_marks_data(marks, early_stop=True, max_errors=1)
+
+        assert result['errors'] == ["Record 2000: Marks obtained (60.0) exceeds max marks (50.0)"]
+
+    def test_early_stop_without_reaching_max_errors(self, mixed_marks):
+        """Test early_stop changes nothing when fewer than max_errors errors exist"""
+        assert (DataValidator.validate_marks_data(mixed_marks, early_stop=True, max_errors=10)
+                == DataValidator.validate_marks_data(mixed_marks))
+
+    def test_validate_marks_data_fast(self, mixed_marks):
+        """Test the fast path agrees with the full validator's is_valid"""
+        valid = [_mark(i, 'university', 70, 100) for i in range(10)]
+        warnings_only = [_mark(1, 'university', 60, 80)]
+        late_error = [_mark(i) for i in range(1500)] + [_mark(1500, marks_obtained=-1)]
+
+        for marks in (valid, warnings_only, late_error, mixed_marks, []):
+            assert DataValidator.validate_marks_data_fast(marks) == DataValidator.validate_marks_data(marks)['is_valid']
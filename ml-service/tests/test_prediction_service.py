@@ -6,8 +6,6 @@ import pytest
 import numpy as np
 import pandas as pd
 import os
-import tempfile
-import shutil
 from unittest.mock import Mock, patch
 import sys
 
@@ -19,11 +17,9 @@ from prediction_service import PredictionService
 class TestPredictionService:
     
     @pytest.fixture
-    def temp_model_path(self):
-        """Create temporary directory for models"""
-        temp_dir = tempfile.mkdtemp()
-        yield temp_dir
-        shutil.rmtree(temp_dir)
+    def temp_model_path(self, tmp_path):
+        """Temporary directory for models (cleaned up by pytest)"""
+        return str(tmp_path)
     
     @pytest.fixture
     def prediction_service(self, temp_model_path):
@@ -109,6 +105,30 @@ class TestPredictionService:
             }
         ]
     
+    @pytest.fixture(scope="session")
+    def extended_training_data(self):
+        """Seeded training data for 15 students, enough to train a model (shared; do not mutate)"""
+        rng = np.random.default_rng(0)
+        base = 60 + 2 * np.arange(15)  # Varying performance
+        university = np.minimum(base + rng.integers(-10, 15, 15), 100)
+        internals = np.minimum((base / 100 * 50).astype(int)[:, None] + rng.integers(-5, 8, (15, 3)), 50)
+        marks = np.column_stack([internals, university]).tolist()
+        
+        exams = [('series_test_1', 50), ('series_test_2', 50), ('lab_internal', 50), ('university', 100)]
+        return [
+            {
+                'student_id': i + 1,
+                'subject_id': 1,
+                'exam_type': exam_type,
+                'marks_obtained': student_marks[j],
+                'max_marks': max_marks,
+                'subject_type': 'theory',
+                'semester': 3
+            }
+            for i, student_marks in enumerate(marks)
+            for j, (exam_type, max_marks) in enumerate(exams)
+        ]
+    
     @pytest.fixture
     def sample_student_data(self):
         """Sample student data for prediction"""
@@ -272,30 +292,8 @@ class TestPredictionService:
         assert all('error' in result for result in results)
 
     @pytest.mark.integration
-    def test_full_training_and_prediction_workflow(self, prediction_service, sample_training_data, sample_student_data):
+    def test_full_training_and_prediction_workflow(self, prediction_service, extended_training_data, sample_student_data):
         """Integration test for full workflow"""
-        # Generate more training data for better model training
-        extended_training_data = []
-        for i in range(15):  # Create 15 students
-            student_id = i + 1
-            base_score = 60 + (i * 2)  # Varying performance
-            
-            for exam_type, max_marks in [('series_test_1', 50), ('series_test_2', 50), ('lab_internal', 50), ('university', 100)]:
-                if exam_type == 'university':
-                    marks = min(100, base_score + np.random.randint(-10, 15))
-                else:
-                    marks = min(50, int((base_score / 100) * 50) + np.random.randint(-5, 8))
-                
-                extended_training_data.append({
-                    'student_id': student_id,
-                    'subject_id': 1,
-                    'exam_type': exam_type,
-                    'marks_obtained': marks,
-                    'max_marks': max_marks,
-                    'subject_type': 'theory',
-                    'semester': 3
-                })
-        
         # Train model
         training_result = prediction_service.train_model(extended_training_data, subject_id=1)
         
@@ -314,33 +312,11 @@ class TestPredictionService:
         assert 0 <= prediction_result['confidence_score'] <= 1
         assert prediction_result['model_version'] == "1.0.0"
     
-    def test_model_persistence(self, temp_model_path, sample_training_data):
+    def test_model_persistence(self, temp_model_path, extended_training_data):
         """Test model saving and loading"""
         # Create service and train model
         service1 = PredictionService(model_path=temp_model_path)
         
-        # Generate sufficient training data
-        extended_training_data = []
-        for i in range(15):
-            student_id = i + 1
-            base_score = 60 + (i * 2)
-            
-            for exam_type, max_marks in [('series_test_1', 50), ('series_test_2', 50), ('lab_internal', 50), ('university', 100)]:
-                if exam_type == 'university':
-                    marks = min(100, base_score + np.random.randint(-10, 15))
-                else:
-                    marks = min(50, int((base_score / 100) * 50) + np.random.randint(-5, 8))
-                
-                extended_training_data.append({
-                    'student_id': student_id,
-                    'subject_id': 1,
-                    'exam_type': exam_type,
-                    'marks_obtained': marks,
-                    'max_marks': max_marks,
-                    'subject_type': 'theory',
-                    'semester': 3
-                })
-        
         training_result = service1.train_model(extended_training_data, subject_id=1)
         assert training_result['success'] is True
         
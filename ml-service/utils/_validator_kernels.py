@@ -0,0 +1,63 @@
+"""
+Numeric kernels used by DataValidator.validate_marks_data
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; check_ranges falls back to NumPy masks
+    njit = None
+
+# Sorted so exam types can be encoded with np.searchsorted
+EXAM_TYPES = np.array(['lab_internal', 'series_test_1', 'series_test_2', 'university'])
+UNIVERSITY_CODE = int(np.searchsorted(EXAM_TYPES, 'university'))
+UNKNOWN_CODE = -1
+
+# Bit flags set in the per-record error array
+NEGATIVE_MARKS = 1
+BAD_MAX_MARKS = 2
+EXCEEDS_MAX = 4
+WRONG_MAX_FOR_TYPE = 8
+
+def encode_exam_types(exam_type: np.ndarray) -> np.ndarray:
+    """Map exam type strings to int8 codes into EXAM_TYPES, UNKNOWN_CODE otherwise"""
+    exam_type = np.asarray(exam_type, dtype=str)
+    pos = np.searchsorted(EXAM_TYPES, exam_type)
+    pos = np.minimum(pos, len(EXAM_TYPES) - 1)
+    return np.where(EXAM_TYPES[pos] == exam_type, pos, UNKNOWN_CODE).astype(np.int8)
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def check_ranges(marks, max_marks, exam_type_code, out_err):
+        """Set range-check bit flags for every record into out_err"""
+        for i in prange(marks.shape[0]):
+            m = marks[i]
+            mx = max_marks[i]
+            code = exam_type_code[i]
+            flags = 0
+            if m < 0:
+                flags |= NEGATIVE_MARKS
+            if mx <= 0:
+                flags |= BAD_MAX_MARKS
+            if m > mx:
+                flags |= EXCEEDS_MAX
+            if code == UNIVERSITY_CODE:
+                if mx != 100:
+                    flags |= WRONG_MAX_FOR_TYPE
+            elif code != UNKNOWN_CODE and mx != 50:
+                flags |= WRONG_MAX_FOR_TYPE
+            out_err[i] = flags
+
+    # Pay the JIT cost at import instead of on the first request
+    check_ranges(np.zeros(1), np.ones(1), np.zeros(1, dtype=np.int8), np.zeros(1, dtype=np.uint8))
+else:
+    def check_ranges(marks, max_marks, exam_type_code, out_err):
+        """Set range-check bit flags for every record into out_err"""
+        expected_max = np.where(exam_type_code == UNIVERSITY_CODE, 100, 50)
+        out_err[:] = (
+            (marks < 0) * NEGATIVE_MARKS
+            | (max_marks <= 0) * BAD_MAX_MARKS
+            | (marks > max_marks) * EXCEEDS_MAX
+            | ((exam_type_code != UNKNOWN_CODE) & (max_marks != expected_max)) * WRONG_MAX_FOR_TYPE
+        )
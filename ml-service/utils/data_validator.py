@@ -3,13 +3,129 @@ Data validation utilities for ML service with comprehensive error handling
 """
 
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import sys
+from functools import lru_cache
+from typing import Annotated, Dict, Iterator, List, Any, Tuple, Union
 import numpy as np
-import traceback
 from datetime import datetime
 
+from utils._validator_kernels import (
+    BAD_MAX_MARKS, EXCEEDS_MAX, NEGATIVE_MARKS, WRONG_MAX_FOR_TYPE,
+    check_ranges, encode_exam_types,
+)
+
+try:
+    import msgspec
+except ImportError:  # msgspec is optional; fastjsonschema or the field-by-field checks are used instead
+    msgspec = None
+
+try:
+    import fastjsonschema
+except ImportError:  # fastjsonschema is optional; requests go through the field-by-field checks
+    fastjsonschema = None
+
 logger = logging.getLogger(__name__)
 
+# Schemas for requests that need no coercion, warnings or errors; anything they
+# reject is re-checked field by field so the error messages stay the same
+_ID = {'type': 'integer'}
+_ACADEMIC_YEAR = {'type': 'integer', 'minimum': 2020, 'maximum': 2026}
+
+PREDICTION_REQUEST_SCHEMA = {
+    'type': 'object',
+    'required': ['student_id', 'subject_id'],
+    'properties': {'student_id': _ID, 'subject_id': _ID, 'academic_year': _ACADEMIC_YEAR}
+}
+
+TRAINING_REQUEST_SCHEMA = {
+    'type': 'object',
+    'properties': {'subject_id': _ID, 'academic_year': _ACADEMIC_YEAR}
+}
+
+TOGGLE_REQUEST_SCHEMA = {
+    'type': 'object',
+    'required': ['is_visible'],
+    'properties': {'is_visible': {'type': 'boolean'}, 'faculty_id': _ID}
+}
+
+if msgspec is not None:
+    # Typed views of the same request shapes; msgspec.convert checks them in C, strictly
+    # (no bool-for-int or str-to-int coercion), so a successful convert implies a clean result
+    _OptionalId = Union[int, msgspec.UnsetType]
+    _OptionalAcademicYear = Union[Annotated[int, msgspec.Meta(ge=2020, le=2026)], msgspec.UnsetType]
+    
+    class PredictionRequest(msgspec.Struct):
+        student_id: int
+        subject_id: int
+        academic_year: _OptionalAcademicYear = msgspec.UNSET
+    
+    class TrainingRequest(msgspec.Struct):
+        subject_id: _OptionalId = msgspec.UNSET
+        academic_year: _OptionalAcademicYear = msgspec.UNSET
+    
+    class ToggleRequest(msgspec.Struct):
+        is_visible: bool
+        faculty_id: _OptionalId = msgspec.UNSET
+else:
+    PredictionRequest = TrainingRequest = ToggleRequest = None
+
+def _compile_schema(struct_type, schema: Dict):
+    """
+    Build a predicate for requests that need no coercion, warnings or errors
+    
+    Uses msgspec when installed, then fastjsonschema; returns None without either.
+    """
+    if struct_type is not None:
+        def matches(request_data: Dict) -> bool:
+            try:
+                msgspec.convert(request_data, struct_type)
+                return True
+            except msgspec.ValidationError:
+                return False
+        return matches
+    
+    if fastjsonschema is not None:
+        validate = fastjsonschema.compile(schema)
+        
+        def matches(request_data: Dict) -> bool:
+            try:
+                validate(request_data)
+                return True
+            except fastjsonschema.JsonSchemaException:
+                return False
+        return matches
+    
+    return None
+
+def _matches_schema(matches, request_data: Dict) -> bool:
+    """Whether request_data passes a compiled request predicate"""
+    return matches is not None and matches(request_data)
+
+_validate_prediction = _compile_schema(PredictionRequest, PREDICTION_REQUEST_SCHEMA)
+_validate_training = _compile_schema(TrainingRequest, TRAINING_REQUEST_SCHEMA)
+_validate_toggle = _compile_schema(ToggleRequest, TOGGLE_REQUEST_SCHEMA)
+
+_MARKS_REQUIRED_FIELDS = ['student_id', 'subject_id', 'exam_type', 'marks_obtained', 'max_marks']
+_MARKS_NUMERIC_FIELDS = ['student_id', 'subject_id', 'marks_obtained', 'max_marks']
+
+# Internal exam types in feature order, plus an interned set for membership tests
+_INTERNAL_EXAMS = ('series_test_1', 'series_test_2', 'lab_internal')
+_INTERNAL_EXAM_SET = frozenset(map(sys.intern, _INTERNAL_EXAMS))
+
+# Records scanned per chunk when validation may stop at the first errors
+_EARLY_STOP_CHUNK = 1024
+
+# Per-record marks messages, formatted with (record index, *args) only when needed
+_MARKS_MESSAGES = {
+    'missing_fields': "Record {0}: Missing fields {1}",
+    'type_error': "Record {0}: Data type error - {1}",
+    'negative_marks': "Record {0}: Negative marks obtained: {1}",
+    'bad_max_marks': "Record {0}: Invalid max marks: {1}",
+    'exceeds_max': "Record {0}: Marks obtained ({1}) exceeds max marks ({2})",
+    'wrong_max_internal': "Record {0}: Expected max marks 50 for {1}, got {2}",
+    'wrong_max_university': "Record {0}: Expected max marks 100 for university exam, got {1}"
+}
+
 class ValidationError(Exception):
     """Custom exception for validation errors"""
     def __init__(self, message: str, details: Dict = None, error_code: str = "VALIDATION_ERROR"):
@@ -33,12 +149,17 @@ class DataValidator:
     """
     
     @staticmethod
-    def validate_marks_data(marks_data: List[Dict]) -> Dict[str, Any]:
+    def validate_marks_data(marks_data: List[Dict], early_stop: bool = False,
+                            max_errors: int = 10) -> Dict[str, Any]:
         """
         Validate marks data for training
         
         Args:
             marks_data: List of mark records
+            early_stop: Stop scanning once max_errors errors are found. The result
+                then lists only those errors, and its warnings and stats cover only
+                the records scanned so far. Use it when only is_valid matters.
+            max_errors: Error count that triggers early_stop
             
         Returns:
             Validation result dictionary
@@ -61,60 +182,56 @@ class DataValidator:
             validation_result['errors'].append("No marks data provided")
             return validation_result
         
-        required_fields = ['student_id', 'subject_id', 'exam_type', 'marks_obtained', 'max_marks']
-        students = set()
-        subjects = set()
-        exam_types = {}
-        
-        for i, record in enumerate(marks_data):
-            # Check required fields
-            missing_fields = [field for field in required_fields if field not in record or record[field] is None]
-            if missing_fields:
-                validation_result['errors'].append(f"Record {i}: Missing fields {missing_fields}")
-                validation_result['stats']['missing_fields'].extend(missing_fields)
-                continue
+        # Scan in chunks when stopping early so a bad batch is refused after O(k) records
+        chunk_size = _EARLY_STOP_CHUNK if early_stop else len(marks_data)
+        scans = []
+        errors = []
+        warnings = []
+        for offset in range(0, len(marks_data), chunk_size):
+            scan = DataValidator._scan_marks(marks_data[offset:offset + chunk_size])
+            scans.append(scan)
             
-            # Validate data types and ranges
-            try:
-                student_id = int(record['student_id'])
-                subject_id = int(record['subject_id'])
-                marks_obtained = float(record['marks_obtained'])
-                max_marks = float(record['max_marks'])
-                exam_type = str(record['exam_type'])
-                
-                students.add(student_id)
-                subjects.add(subject_id)
-                exam_types[exam_type] = exam_types.get(exam_type, 0) + 1
-                
-                # Validate mark ranges
-                if marks_obtained < 0:
-                    validation_result['errors'].append(f"Record {i}: Negative marks obtained: {marks_obtained}")
-                
-                if max_marks <= 0:
-                    validation_result['errors'].append(f"Record {i}: Invalid max marks: {max_marks}")
-                
-                if marks_obtained > max_marks:
-                    validation_result['errors'].append(f"Record {i}: Marks obtained ({marks_obtained}) exceeds max marks ({max_marks})")
-                
-                # Validate exam type specific ranges
-                if exam_type in ['series_test_1', 'series_test_2', 'lab_internal'] and max_marks != 50:
-                    validation_result['warnings'].append(f"Record {i}: Expected max marks 50 for {exam_type}, got {max_marks}")
-                
-                if exam_type == 'university' and max_marks != 100:
-                    validation_result['warnings'].append(f"Record {i}: Expected max marks 100 for university exam, got {max_marks}")
-                
-            except (ValueError, TypeError) as e:
-                validation_result['errors'].append(f"Record {i}: Data type error - {str(e)}")
+            # Messages are formatted here, in record order, rather than while scanning
+            chunk_errors = sorted(DataValidator._iter_errors(scan), key=lambda issue: issue[0])
+            errors.extend(_MARKS_MESSAGES[code].format(i + offset, *args) for i, code, args in chunk_errors)
+            warnings.extend(_MARKS_MESSAGES[code].format(i + offset, *args)
+                            for i, code, args in DataValidator._iter_warnings(scan))
+            if early_stop and len(errors) >= max_errors:
+                del errors[max_errors:]
+                break
+        
+        validation_result['errors'] = errors
+        validation_result['warnings'] = warnings
+        
+        if len(scans) == 1:
+            values = scans[0]['values']
+            valid = scans[0]['valid']
+            exam_type = scans[0]['exam_type']
+            missing = scans[0]['missing'].any(axis=0)
+        else:
+            values = {field: np.concatenate([scan['values'][field] for scan in scans])
+                      for field in ('student_id', 'subject_id')}
+            valid = np.concatenate([scan['valid'] for scan in scans])
+            exam_type = np.concatenate([scan['exam_type'] for scan in scans])
+            missing = np.any([scan['missing'].any(axis=0) for scan in scans], axis=0)
+        
+        # int() truncates toward zero, as does np.trunc
+        n_students = np.unique(np.trunc(values['student_id'][valid])).size
+        n_subjects = np.unique(np.trunc(values['subject_id'][valid])).size
+        exam_names, exam_counts = np.unique(exam_type[valid], return_counts=True)
+        exam_types = dict(zip(exam_names.tolist(), exam_counts.tolist()))
         
         # Update stats
-        validation_result['stats']['unique_students'] = len(students)
-        validation_result['stats']['unique_subjects'] = len(subjects)
+        validation_result['stats']['unique_students'] = n_students
+        validation_result['stats']['unique_subjects'] = n_subjects
         validation_result['stats']['exam_type_counts'] = exam_types
-        validation_result['stats']['missing_fields'] = list(set(validation_result['stats']['missing_fields']))
+        validation_result['stats']['missing_fields'] = [field for field, is_missing in
+                                                        zip(_MARKS_REQUIRED_FIELDS, missing)
+                                                        if is_missing]
         
         # Check if we have enough data for training
-        if len(students) < 5:
-            validation_result['warnings'].append(f"Low number of unique students: {len(students)}. Recommend at least 5 for training.")
+        if n_students < 5:
+            validation_result['warnings'].append(f"Low number of unique students: {n_students}. Recommend at least 5 for training.")
         
         if 'university' not in exam_types:
             validation_result['warnings'].append("No university exam marks found. Cannot train prediction model without target values.")
@@ -124,6 +241,105 @@ class DataValidator:
         
         return validation_result
     
+    @staticmethod
+    def validate_marks_data_fast(marks_data: List[Dict]) -> bool:
+        """Whether validate_marks_data would report no errors, without building messages"""
+        if not marks_data:
+            return False
+        for offset in range(0, len(marks_data), _EARLY_STOP_CHUNK):
+            scan = DataValidator._scan_marks(marks_data[offset:offset + _EARLY_STOP_CHUNK])
+            if next(DataValidator._iter_errors(scan), None) is not None:
+                return False
+        return True
+    
+    @staticmethod
+    def _scan_marks(marks_data: List[Dict]) -> Dict[str, Any]:
+        """Coerce mark records into column arrays and run the range kernel over them"""
+        import pandas as pd  # deferred: only marks validation needs pandas
+        
+        df = pd.DataFrame(marks_data, columns=_MARKS_REQUIRED_FIELDS)
+        n_records = len(df)
+        if df['exam_type'].dtype != object:
+            # Numeric exam types next to missing ones were upcast to float; keep the
+            # original values so messages and stats use str(value) as before
+            df['exam_type'] = pd.Series([record.get('exam_type') for record in marks_data], dtype=object)
+        
+        missing = df.isna().to_numpy()
+        missing_rows = missing.any(axis=1)
+        
+        # Coerce numeric columns in one pass each; anything the vectorized cast cannot
+        # represent faithfully (strings, non-numeric objects, non-finite ids) is
+        # converted record by record below so messages match int()/float() exactly
+        values = {field: pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)
+                  for field in _MARKS_NUMERIC_FIELDS}
+        needs_scalar = np.zeros(n_records, dtype=bool)
+        for field in _MARKS_NUMERIC_FIELDS:
+            needs_scalar |= np.isnan(values[field])
+            if df[field].dtype == object:
+                needs_scalar |= df[field].map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        needs_scalar |= ~np.isfinite(values['student_id']) | ~np.isfinite(values['subject_id'])
+        needs_scalar &= ~missing_rows
+        
+        valid = ~missing_rows & ~needs_scalar
+        type_errors = []
+        for i in np.flatnonzero(needs_scalar):
+            record = marks_data[i]
+            try:
+                values['student_id'][i] = int(record['student_id'])
+                values['subject_id'][i] = int(record['subject_id'])
+                values['marks_obtained'][i] = float(record['marks_obtained'])
+                values['max_marks'][i] = float(record['max_marks'])
+                valid[i] = True
+            except (ValueError, TypeError) as e:
+                type_errors.append((i, str(e)))
+        
+        # Validate mark ranges and exam type specific ranges in one kernel pass
+        exam_type = df['exam_type'].astype(str).to_numpy()
+        flags = np.zeros(n_records, dtype=np.uint8)
+        check_ranges(values['marks_obtained'], values['max_marks'], encode_exam_types(exam_type), flags)
+        flags[~valid] = 0
+        
+        return {
+            'missing': missing,
+            'missing_rows': missing_rows,
+            'values': values,
+            'valid': valid,
+            'type_errors': type_errors,
+            'exam_type': exam_type,
+            'flags': flags
+        }
+    
+    @staticmethod
+    def _iter_errors(scan: Dict[str, Any]) -> Iterator[Tuple[int, str, tuple]]:
+        """Yield (record index, message code, message args) for each error in a scan"""
+        missing = scan['missing']
+        for i in np.flatnonzero(scan['missing_rows']):
+            yield i, 'missing_fields', ([field for field, is_missing in zip(_MARKS_REQUIRED_FIELDS, missing[i]) if is_missing],)
+        for i, message in scan['type_errors']:
+            yield i, 'type_error', (message,)
+        
+        # Per record, negative / bad max / exceeds keep their original order after a stable sort
+        flags = scan['flags']
+        marks_obtained = scan['values']['marks_obtained']
+        max_marks = scan['values']['max_marks']
+        for i in np.flatnonzero(flags & NEGATIVE_MARKS):
+            yield i, 'negative_marks', (float(marks_obtained[i]),)
+        for i in np.flatnonzero(flags & BAD_MAX_MARKS):
+            yield i, 'bad_max_marks', (float(max_marks[i]),)
+        for i in np.flatnonzero(flags & EXCEEDS_MAX):
+            yield i, 'exceeds_max', (float(marks_obtained[i]), float(max_marks[i]))
+    
+    @staticmethod
+    def _iter_warnings(scan: Dict[str, Any]) -> Iterator[Tuple[int, str, tuple]]:
+        """Yield (record index, message code, message args) for each per-record warning in a scan"""
+        exam_type = scan['exam_type']
+        max_marks = scan['values']['max_marks']
+        for i in np.flatnonzero(scan['flags'] & WRONG_MAX_FOR_TYPE):
+            if exam_type[i] == 'university':
+                yield i, 'wrong_max_university', (float(max_marks[i]),)
+            else:
+                yield i, 'wrong_max_internal', (exam_type[i], float(max_marks[i]))
+    
     @staticmethod
     def validate_student_data(student_data: Dict) -> Dict[str, Any]:
         """
@@ -153,19 +369,24 @@ class DataValidator:
         
         # Validate marks data
         marks = student_data.get('marks', {})
-        internal_exams = ['series_test_1', 'series_test_2', 'lab_internal']
-        available_marks = [exam for exam in internal_exams if exam in marks and marks[exam] > 0]
+        internal_marks = np.array([marks.get(exam, 0.0) for exam in _INTERNAL_EXAMS], dtype=np.float64)
+        available = internal_marks > 0
+        n_available = int(available.sum())
         
-        if not available_marks:
+        if not n_available:
             validation_result['is_valid'] = False
             validation_result['errors'].append("No internal assessment marks available for prediction")
             return validation_result
         
         # Calculate completeness score
-        validation_result['completeness_score'] = len(available_marks) / len(internal_exams)
+        validation_result['completeness_score'] = n_available / len(_INTERNAL_EXAMS)
         
         # Validate mark values
+        for i in np.flatnonzero((internal_marks < 0) | (internal_marks > 100)):
+            validation_result['errors'].append(f"Invalid mark percentage for {_INTERNAL_EXAMS[i]}: {float(internal_marks[i])}")
         for exam_type, mark_value in marks.items():
+            if exam_type in _INTERNAL_EXAM_SET:
+                continue
             try:
                 mark_float = float(mark_value)
                 if mark_float < 0 or mark_float > 100:
@@ -174,14 +395,16 @@ class DataValidator:
                 validation_result['errors'].append(f"Invalid mark value for {exam_type}: {mark_value}")
         
         # Warnings for missing data
-        missing_internals = [exam for exam in internal_exams if exam not in marks or marks[exam] == 0]
+        missing_internals = [_INTERNAL_EXAMS[i] for i in np.flatnonzero(internal_marks == 0)]
         if missing_internals:
             validation_result['warnings'].append(f"Missing internal marks: {missing_internals}. Prediction accuracy may be reduced.")
         
         # Check for consistency in marks
-        if len(available_marks) >= 2:
-            mark_values = [marks[exam] for exam in available_marks]
-            variance = np.var(mark_values)
+        if n_available >= 2:
+            mark_values = internal_marks[available].tolist()
+            # Population variance on at most three floats; cheaper than np.var's dispatch
+            mean = sum(mark_values) / len(mark_values)
+            variance = sum((x - mean) * (x - mean) for x in mark_values) / len(mark_values)
             if variance > 400:  # High variance (>20% standard deviation)
                 validation_result['warnings'].append("High variance in internal marks detected. Prediction may be less reliable.")
         
@@ -200,6 +423,16 @@ class DataValidator:
         Returns:
             Validation result dictionary
         """
+        if request_data:
+            try:
+                return _thaw_result(_cached_prediction_request(_request_key(request_data)))
+            except TypeError:  # non-scalar values are validated uncached
+                pass
+        return DataValidator._validate_prediction_request(request_data)
+    
+    @staticmethod
+    def _validate_prediction_request(request_data: Dict) -> Dict[str, Any]:
+        """Validate prediction request data (uncached)"""
         validation_result = {
             'is_valid': True,
             'errors': [],
@@ -211,6 +444,9 @@ class DataValidator:
             validation_result['errors'].append("Request data is required")
             return validation_result
         
+        if _matches_schema(_validate_prediction, request_data):
+            return validation_result
+        
         # Check required fields
         required_fields = ['student_id', 'subject_id']
         missing_fields = [field for field in required_fields if field not in request_data]
@@ -254,7 +490,7 @@ class DataValidator:
         }
         
         # Training request can be empty (will use all available data)
-        if not request_data:
+        if not request_data or _matches_schema(_validate_training, request_data):
             return validation_result
         
         # Validate optional fields
@@ -288,6 +524,16 @@ class DataValidator:
         Returns:
             Validation result dictionary
         """
+        if request_data:
+            try:
+                return _thaw_result(_cached_toggle_request(_request_key(request_data)))
+            except TypeError:  # non-scalar values are validated uncached
+                pass
+        return DataValidator._validate_toggle_request(request_data)
+    
+    @staticmethod
+    def _validate_toggle_request(request_data: Dict) -> Dict[str, Any]:
+        """Validate prediction visibility toggle request (uncached)"""
         validation_result = {
             'is_valid': True,
             'errors': [],
@@ -299,12 +545,15 @@ class DataValidator:
             validation_result['errors'].append("Request data is required")
             return validation_result
         
+        if _matches_schema(_validate_toggle, request_data):
+            return validation_result
+        
         # Check required fields
         if 'is_visible' not in request_data:
             validation_result['is_valid'] = False
             validation_result['errors'].append("is_visible field is required")
         else:
-            if not isinstance(request_data['is_visible'], bool):
+            if type(request_data['is_visible']) is not bool:
                 validation_result['is_valid'] = False
                 validation_result['errors'].append("is_visible must be a boolean value")
         
@@ -316,4 +565,42 @@ class DataValidator:
                 validation_result['is_valid'] = False
                 validation_result['errors'].append("Invalid faculty_id type")
         
-        return validation_result
\ No newline at end of file
+        return validation_result
+
+# Requests are memoized only when small and flat; anything else is validated uncached
+_CACHEABLE_TYPES = (str, int, float, bool, type(None))
+_MAX_CACHED_FIELDS = 8
+_MAX_CACHED_STR = 64
+
+def _request_key(request_data: Dict) -> Tuple:
+    """
+    Hashable view of a small, flat request; value types are part of the key so True and 1
+    differ. Raises TypeError for requests that should not be cached.
+    """
+    if len(request_data) > _MAX_CACHED_FIELDS:
+        raise TypeError("request too large to cache")
+    items = []
+    for key, value in request_data.items():
+        if not isinstance(value, _CACHEABLE_TYPES) or (type(value) is str and len(value) > _MAX_CACHED_STR):
+            raise TypeError("request value not cacheable")
+        items.append((key, type(value), value))
+    return tuple(sorted(items))
+
+def _freeze_result(result: Dict[str, Any]) -> Tuple:
+    """Immutable form of a validation result, safe to keep in the cache"""
+    return tuple((key, tuple(value) if isinstance(value, list) else value)
+                 for key, value in result.items())
+
+def _thaw_result(frozen: Tuple) -> Dict[str, Any]:
+    """Fresh validation result dictionary built from its cached form"""
+    return {key: list(value) if isinstance(value, tuple) else value for key, value in frozen}
+
+@lru_cache(maxsize=256)
+def _cached_prediction_request(key: Tuple) -> Tuple:
+    """Memoized prediction request validation keyed on _request_key"""
+    return _freeze_result(DataValidator._validate_prediction_request({k: v for k, _, v in key}))
+
+@lru_cache(maxsize=256)
+def _cached_toggle_request(key: Tuple) -> Tuple:
+    """Memoized toggle request validation keyed on _request_key"""
+    return _freeze_result(DataValidator._validate_toggle_request({k: v for k, _, v in key}))
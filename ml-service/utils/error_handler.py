@@ -2,25 +2,81 @@
 Comprehensive error handling utilities for ML service
 """
 
+import atexit
 import logging
+import math
+import pickle
+import queue
+import re
 import traceback
 import sys
+import time
+from contextvars import ContextVar
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, Any, Optional, Tuple, List
-from functools import wraps
+from functools import lru_cache, partial, wraps
+from operator import is_
 import numpy as np
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Substring classifier for database errors ('connect' also covers 'connection')
+_DB_ERROR_RE = re.compile(r'(connect)|(timeout)|(syntax|sql)', re.IGNORECASE)
+_DB_ERROR_CATEGORIES = {
+    1: ("Database connection failed", 'connection'),
+    2: ("Database operation timed out", 'timeout'),
+    3: ("Database query error", 'query')
+}
+
+# C-level "item is None" predicate for counting None entries
+_is_none = partial(is_, None)
+
+# Internal assessment marks (out of 50) that get_fallback_prediction averages
+_MARK_KEYS = ('series_test_1_marks', 'series_test_2_marks', 'lab_internal_marks')
+
+# Responses of get_fallback_prediction; copied and filled in per call
+_FALLBACK_TEMPLATE = {
+    'predicted_marks': 65.0,
+    'confidence_score': 0.3,
+    'prediction_method': 'fallback',
+    'warning': 'This is a fallback prediction due to model unavailability',
+    'fallback_reason': 'Primary prediction model failed',
+    'data_quality': 'limited'
+}
+_EMERGENCY_FALLBACK = {
+    'predicted_marks': 60.0,
+    'confidence_score': 0.2,
+    'prediction_method': 'emergency_fallback',
+    'warning': 'Emergency fallback prediction - please try again later',
+    'error': 'Both primary and fallback predictions failed'
+}
+
+# Id of the request being handled; error responses fall back to it when no id is passed
+_REQUEST_ID: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
 class MLServiceError(Exception):
     """Base exception for ML service errors"""
+    _timestamp = None  # set only when a caller assigns timestamp explicitly
+    
     def __init__(self, message: str, error_code: str = "ML_SERVICE_ERROR", details: Dict = None):
         self.message = message
         self.error_code = error_code
         self.details = details or {}
-        self.timestamp = datetime.utcnow().isoformat()
+        self._created_at = time.time()  # formatted lazily; most errors are never serialized
         super().__init__(self.message)
+    
+    @property
+    def timestamp(self) -> str:
+        """UTC ISO-8601 time at which the error was created"""
+        if self._timestamp is not None:
+            return self._timestamp
+        return datetime.utcfromtimestamp(self._created_at).isoformat()
+    
+    @timestamp.setter
+    def timestamp(self, value: str):
+        self._timestamp = value
 
 class PredictionError(MLServiceError):
     """Exception for prediction-related errors"""
@@ -47,6 +103,21 @@ class ExternalServiceError(MLServiceError):
     def __init__(self, message: str, details: Dict = None):
         super().__init__(message, "EXTERNAL_SERVICE_ERROR", details)
 
+class ExpectedFallback(MLServiceError):
+    """Raised by prediction code to request the fallback prediction without logging an error"""
+    def __init__(self, message: str = "Fallback prediction requested", details: Dict = None):
+        super().__init__(message, "EXPECTED_FALLBACK", details)
+
+def _drop_wrapper_frame(error: BaseException) -> BaseException:
+    """
+    Trim the decorator's own frame from an exception caught inside a wrapper so
+    formatted and chained tracebacks start at the wrapped function
+    """
+    tb = error.__traceback__
+    if tb is not None and tb.tb_next is not None:
+        error.with_traceback(tb.tb_next)
+    return error
+
 def handle_ml_errors(func):
     """
     Decorator for handling ML service errors with graceful degradation
@@ -59,15 +130,20 @@ def handle_ml_errors(func):
             # Re-raise ML service errors as-is
             raise
         except Exception as e:
+            _drop_wrapper_frame(e)
             # Convert unexpected errors to ML service errors
-            error_details = {
-                'function': func.__name__,
-                'args': str(args)[:200],  # Limit length
-                'kwargs': str(kwargs)[:200],
-                'traceback': traceback.format_exc()
-            }
+            error_details = {'function': func.__name__}
             
-            logger.error(f"Unexpected error in {func.__name__}: {str(e)}", extra=error_details)
+            # Formatting args and the traceback is only worth it when the error is logged
+            if logger.isEnabledFor(logging.ERROR):
+                error_details.update({
+                    'args': str(args)[:200],  # Limit length
+                    'kwargs': str(kwargs)[:200],
+                    'traceback': traceback.format_exc()
+                })
+                # Nested under one key: 'args' would clash with the LogRecord attribute
+                logger.error("Unexpected error in %s: %s", func.__name__, e,
+                             extra={'error_details': error_details})
             
             raise MLServiceError(
                 f"Unexpected error in {func.__name__}: {str(e)}",
@@ -89,12 +165,17 @@ def handle_prediction_errors(func):
             # Re-raise prediction/model errors
             raise
         except Exception as e:
-            logger.error(f"Prediction error in {func.__name__}: {str(e)}")
+            _drop_wrapper_frame(e)
+            expected = isinstance(e, ExpectedFallback)
+            if not expected:
+                # The traceback is never surfaced here, so don't let handlers format it
+                logger.error("Prediction error in %s: %s", func.__name__, e, exc_info=False)
             
             # Try to provide a fallback prediction
             fallback_result = get_fallback_prediction(*args, **kwargs)
             if fallback_result is not None:
-                logger.warning(f"Using fallback prediction for {func.__name__}")
+                if not expected:
+                    logger.warning("Using fallback prediction for %s", func.__name__)
                 return fallback_result
             
             # If no fallback available, raise error
@@ -124,35 +205,26 @@ def get_fallback_prediction(*args, **kwargs) -> Optional[Dict]:
         
         # If we have some historical data, use it for better fallback
         if student_data:
-            series_test_1 = student_data.get('series_test_1_marks', 0)
-            series_test_2 = student_data.get('series_test_2_marks', 0)
-            lab_internal = student_data.get('lab_internal_marks', 0)
+            marks = np.fromiter((student_data.get(key, 0) for key in _MARK_KEYS),
+                                dtype=np.float64, count=len(_MARK_KEYS))
             
             # Simple average-based fallback if we have some marks
-            available_marks = [mark for mark in [series_test_1, series_test_2, lab_internal] if mark > 0]
-            if available_marks:
+            available_marks = marks[marks > 0]
+            if available_marks.size:
                 # Scale to university exam range (0-100)
-                avg_percentage = sum(available_marks) / len(available_marks) / 50 * 100  # Assuming 50 is max for internals
+                avg_percentage = float(available_marks.mean()) / 50 * 100  # Assuming 50 is max for internals
                 fallback_marks = min(max(avg_percentage, 35), 85)  # Clamp between 35-85
                 confidence = 0.5  # Slightly higher confidence with data
         
-        return {
-            'predicted_marks': round(fallback_marks, 1),
-            'confidence_score': confidence,
-            'prediction_method': 'fallback',
-            'warning': 'This is a fallback prediction due to model unavailability',
-            'fallback_reason': 'Primary prediction model failed',
-            'data_quality': 'limited' if not student_data else 'partial'
-        }
+        result = _FALLBACK_TEMPLATE.copy()
+        result['predicted_marks'] = round(fallback_marks, 1)
+        result['confidence_score'] = confidence
+        if student_data:
+            result['data_quality'] = 'partial'
+        return result
     except Exception as e:
         logger.error(f"Fallback prediction also failed: {str(e)}")
-        return {
-            'predicted_marks': 60.0,
-            'confidence_score': 0.2,
-            'prediction_method': 'emergency_fallback',
-            'warning': 'Emergency fallback prediction - please try again later',
-            'error': 'Both primary and fallback predictions failed'
-        }
+        return _EMERGENCY_FALLBACK.copy()
 
 def validate_data_integrity(data: Any, data_type: str = "unknown") -> Tuple[bool, List[str]]:
     """
@@ -171,8 +243,9 @@ def validate_data_integrity(data: Any, data_type: str = "unknown") -> Tuple[bool
             if len(data) == 0:
                 errors.append(f"{data_type} data is empty")
             
-            # Check for None values in list
-            none_count = sum(1 for item in data if item is None)
+            # Check for None values in list (identity test mapped in C; list.count would
+            # call __eq__, which is ambiguous for array items)
+            none_count = sum(map(_is_none, data))
             if none_count > 0:
                 errors.append(f"{data_type} contains {none_count} None values")
         
@@ -189,19 +262,21 @@ def validate_data_integrity(data: Any, data_type: str = "unknown") -> Tuple[bool
             if data.size == 0:
                 errors.append(f"{data_type} array is empty")
             
-            # Check for NaN or infinite values
-            if np.isnan(data).any():
-                errors.append(f"{data_type} contains NaN values")
-            
-            if np.isinf(data).any():
-                errors.append(f"{data_type} contains infinite values")
+            # Check for NaN or infinite values; one isfinite pass, and only tell
+            # NaN from Inf apart when something non-finite is present
+            if not np.isfinite(data).all():
+                if np.isnan(data).any():
+                    errors.append(f"{data_type} contains NaN values")
+                
+                if np.isinf(data).any():
+                    errors.append(f"{data_type} contains infinite values")
         
         elif isinstance(data, pd.DataFrame):
             if data.empty:
                 errors.append(f"{data_type} DataFrame is empty")
             
             # Check for missing values
-            missing_count = data.isnull().sum().sum()
+            missing_count = data.isnull().to_numpy().sum()
             if missing_count > 0:
                 errors.append(f"{data_type} DataFrame has {missing_count} missing values")
         
@@ -211,16 +286,55 @@ def validate_data_integrity(data: Any, data_type: str = "unknown") -> Tuple[bool
         errors.append(f"Error validating {data_type} data integrity: {str(e)}")
         return False, errors
 
+def validate_data_integrity_batch(arrays: List[np.ndarray], data_type: str = "unknown") -> List[Tuple[bool, List[str]]]:
+    """
+    Validate many arrays at once; same results as validate_data_integrity per array
+    
+    Numeric arrays are checked with a single np.isfinite pass over their concatenation.
+    Anything else (non-arrays, non-numeric dtypes) is validated one by one.
+    """
+    results = [None] * len(arrays)
+    numeric = [i for i, data in enumerate(arrays)
+               if isinstance(data, np.ndarray) and data.dtype.kind in 'biuf']
+    
+    if numeric:
+        sizes = [arrays[i].size for i in numeric]
+        nonfinite = ~np.isfinite(np.concatenate([arrays[i].ravel() for i in numeric]))
+        # Non-finite count per array from prefix sums over the concatenated mask
+        ends = np.cumsum(sizes)
+        prefix = np.concatenate(([0], np.cumsum(nonfinite)))
+        counts = prefix[ends] - prefix[ends - sizes]
+        
+        for i, size, count in zip(numeric, sizes, counts):
+            if count:
+                results[i] = validate_data_integrity(arrays[i], data_type)
+            elif size == 0:
+                results[i] = (False, [f"{data_type} array is empty"])
+            else:
+                results[i] = (True, [])
+    
+    for i, data in enumerate(arrays):
+        if results[i] is None:
+            results[i] = validate_data_integrity(data, data_type)
+    
+    return results
+
 def safe_numeric_conversion(value: Any, default: float = 0.0) -> float:
     """
     Safely convert value to numeric with error handling
     """
     try:
+        # Fast paths for plain floats and ints, the common case
+        if type(value) is float:
+            return value if math.isfinite(value) else default
+        if type(value) is int:
+            return float(value)
+        
         if value is None:
             return default
         
         if isinstance(value, (int, float)):
-            if np.isnan(value) or np.isinf(value):
+            if not math.isfinite(value):
                 return default
             return float(value)
         
@@ -248,57 +362,78 @@ def handle_database_errors(func):
         try:
             return func(*args, **kwargs)
         except Exception as e:
-            error_message = str(e).lower()
+            error_message = str(e)
             
-            # Categorize database errors
-            if 'connection' in error_message or 'connect' in error_message:
-                raise DatabaseError(
-                    "Database connection failed",
-                    {'original_error': str(e), 'category': 'connection'}
-                )
-            elif 'timeout' in error_message:
-                raise DatabaseError(
-                    "Database operation timed out",
-                    {'original_error': str(e), 'category': 'timeout'}
-                )
-            elif 'syntax' in error_message or 'sql' in error_message:
-                raise DatabaseError(
-                    "Database query error",
-                    {'original_error': str(e), 'category': 'query'}
-                )
+            # Categorize database errors; the lowest matched group wins, as in the
+            # original connection -> timeout -> query precedence
+            matched = {match.lastindex for match in _DB_ERROR_RE.finditer(error_message)}
+            if matched:
+                message, category = _DB_ERROR_CATEGORIES[min(matched)]
             else:
-                raise DatabaseError(
-                    f"Database error: {str(e)}",
-                    {'original_error': str(e), 'category': 'unknown'}
-                )
+                message, category = f"Database error: {error_message}", 'unknown'
+            
+            raise DatabaseError(message, {'original_error': error_message, 'category': category})
     
     return wrapper
 
-def create_error_response(error: Exception, request_id: str = None) -> Dict[str, Any]:
+def set_request_id(request_id: Optional[str]):
     """
-    Create standardized error response
+    Record the id of the request being handled in the current context
     """
+    return _REQUEST_ID.set(request_id)
+
+def build_error_response(error: Exception, *, request_id: str = None, context: Dict[str, Any] = None,
+                         include_recovery: bool = False) -> Dict[str, Any]:
+    """
+    Create standardized error response, optionally with recovery suggestions
+    """
+    request_id = request_id or _REQUEST_ID.get()
+    
     if isinstance(error, MLServiceError):
-        return {
-            'success': False,
-            'error': {
-                'code': error.error_code,
-                'message': error.message,
-                'details': error.details,
-                'timestamp': error.timestamp,
-                'request_id': request_id
-            }
+        body = {
+            'code': error.error_code,
+            'message': error.message,
+            'details': error.details,
+            'timestamp': error.timestamp,
+            'request_id': request_id
+        }
+        
+        if include_recovery:
+            # Add recovery suggestions based on error type
+            recovery_suggestions = get_recovery_suggestions(error.error_code, error.details)
+            if recovery_suggestions:
+                body['recovery_suggestions'] = recovery_suggestions
+        
+        # Add context information
+        if context:
+            body['context'] = context
+    elif include_recovery:
+        body = {
+            'code': 'UNEXPECTED_ERROR',
+            'message': str(error),
+            'timestamp': datetime.utcnow().isoformat(),
+            'request_id': request_id,
+            'recovery_suggestions': [
+                'Try the request again',
+                'Check your input data',
+                'Contact support if the issue persists'
+            ]
         }
     else:
-        return {
-            'success': False,
-            'error': {
-                'code': 'UNEXPECTED_ERROR',
-                'message': str(error),
-                'timestamp': datetime.utcnow().isoformat(),
-                'request_id': request_id
-            }
+        body = {
+            'code': 'UNEXPECTED_ERROR',
+            'message': str(error),
+            'timestamp': datetime.utcnow().isoformat(),
+            'request_id': request_id
         }
+    
+    return {'success': False, 'error': body}
+
+def create_error_response(error: Exception, request_id: str = None) -> Dict[str, Any]:
+    """
+    Create standardized error response
+    """
+    return build_error_response(error, request_id=request_id)
 
 def log_error_with_context(error: Exception, context: Dict[str, Any] = None):
     """
@@ -325,6 +460,25 @@ def log_error_with_context(error: Exception, context: Dict[str, Any] = None):
     
     logger.error("ML Service Error", extra=log_data)
 
+def enable_queued_logging(target: logging.Logger = None) -> Optional[QueueListener]:
+    """
+    Move the handlers of target (root logger by default) behind a QueueListener
+    so error paths only enqueue records instead of blocking on handler I/O
+    """
+    target = target or logging.getLogger()
+    handlers = [h for h in target.handlers if not isinstance(h, QueueHandler)]
+    if not handlers:
+        return None
+    
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for handler in handlers:
+        target.removeHandler(handler)
+    target.addHandler(QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)  # flush pending records on shutdown
+    return listener
+
 def graceful_degradation(primary_func, fallback_func, *args, **kwargs):
     """
     Execute primary function with fallback on failure
@@ -353,11 +507,10 @@ def retry_with_backoff(func, max_retries: int = 3, base_delay: float = 1.0, back
     """
     Retry function with exponential backoff
     """
-    import time
-    
     @wraps(func)
     def wrapper(*args, **kwargs):
         last_exception = None
+        delay = base_delay
         
         for attempt in range(max_retries + 1):
             try:
@@ -368,9 +521,10 @@ def retry_with_backoff(func, max_retries: int = 3, base_delay: float = 1.0, back
                 if attempt == max_retries:
                     break
                 
-                delay = base_delay * (backoff_factor ** attempt)
-                logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {str(e)}. Retrying in {delay}s...")
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {str(e)}. Retrying in {delay}s...")
                 time.sleep(delay)
+                delay *= backoff_factor
         
         # All retries failed
         raise MLServiceError(
@@ -384,6 +538,24 @@ def retry_with_backoff(func, max_retries: int = 3, base_delay: float = 1.0, back
     
     return wrapper
 
+def _model_size_bytes(model) -> Optional[int]:
+    """
+    Approximate size of a model in bytes, taken as its serialized size.
+    Loaders record this up front; otherwise it is measured once and kept on the model.
+    """
+    size = getattr(model, '_cached_size_bytes', None)
+    if isinstance(size, int):
+        return size
+    try:
+        size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None  # unpicklable models are not size-checked
+    try:
+        model._cached_size_bytes = size
+    except AttributeError:
+        pass
+    return size
+
 def validate_model_health(model, test_data: Optional[np.ndarray] = None) -> Tuple[bool, List[str]]:
     """
     Comprehensive model health validation with detailed diagnostics
@@ -440,18 +612,23 @@ def validate_model_health(model, test_data: Optional[np.ndarray] = None) -> Tupl
                 elif isinstance(prediction, np.ndarray):
                     if prediction.size == 0:
                         issues.append("Model prediction returned empty array")
-                    elif np.isnan(prediction).any():
-                        issues.append("Model prediction contains NaN values")
-                    elif np.isinf(prediction).any():
-                        issues.append("Model prediction contains infinite values")
-                    elif (prediction < 0).any():
-                        warnings.append("Model prediction contains negative values")
-                    elif (prediction > 100).any():
-                        warnings.append("Model prediction contains values > 100")
-                else:
+                    else:
+                        # min/max propagate NaN and surface +-inf, so two reductions cover every check
+                        pmin, pmax = prediction.min(), prediction.max()
+                        if math.isnan(pmin):
+                            issues.append("Model prediction contains NaN values")
+                        elif math.isinf(pmin) or math.isinf(pmax):
+                            issues.append("Model prediction contains infinite values")
+                        elif pmin < 0:
+                            warnings.append("Model prediction contains negative values")
+                        elif pmax > 100:
+                            warnings.append("Model prediction contains values > 100")
+                elif isinstance(prediction, (float, int, np.floating, np.integer)):
                     # Handle scalar predictions
-                    if np.isnan(prediction) or np.isinf(prediction):
+                    if not math.isfinite(prediction):
                         issues.append("Model prediction is NaN or infinite")
+                elif np.isnan(prediction) or np.isinf(prediction):
+                    issues.append("Model prediction is NaN or infinite")
                 
                 # Test prediction consistency
                 if len(test_data) > 1:
@@ -462,14 +639,10 @@ def validate_model_health(model, test_data: Optional[np.ndarray] = None) -> Tupl
             except Exception as e:
                 issues.append(f"Model prediction test failed: {str(e)}")
         
-        # Check model memory usage (if possible)
-        try:
-            import sys
-            model_size = sys.getsizeof(model)
-            if model_size > 100 * 1024 * 1024:  # 100MB
-                warnings.append(f"Model is large ({model_size / 1024 / 1024:.1f}MB)")
-        except Exception:
-            pass  # Memory check is optional
+        # Check model size (sys.getsizeof only sees the shallow object)
+        model_size = _model_size_bytes(model)
+        if model_size is not None and model_size > 100 * 1024 * 1024:  # 100MB
+            warnings.append(f"Model is large ({model_size / 1024 / 1024:.1f}MB)")
         
         # Log warnings
         if warnings:
@@ -485,98 +658,74 @@ def create_comprehensive_error_response(error: Exception, context: Dict[str, Any
     """
     Create comprehensive error response with recovery suggestions
     """
-    context = context or {}
-    
-    if isinstance(error, MLServiceError):
-        response = {
-            'success': False,
-            'error': {
-                'code': error.error_code,
-                'message': error.message,
-                'details': error.details,
-                'timestamp': error.timestamp,
-                'request_id': request_id
-            }
-        }
-        
-        # Add recovery suggestions based on error type
-        recovery_suggestions = get_recovery_suggestions(error.error_code, error.details)
-        if recovery_suggestions:
-            response['error']['recovery_suggestions'] = recovery_suggestions
-            
-        # Add context information
-        if context:
-            response['error']['context'] = context
-            
-        return response
-    else:
-        return {
-            'success': False,
-            'error': {
-                'code': 'UNEXPECTED_ERROR',
-                'message': str(error),
-                'timestamp': datetime.utcnow().isoformat(),
-                'request_id': request_id,
-                'recovery_suggestions': [
-                    'Try the request again',
-                    'Check your input data',
-                    'Contact support if the issue persists'
-                ]
-            }
-        }
+    return build_error_response(error, request_id=request_id, context=context, include_recovery=True)
+
+# Recovery suggestions per error code, shared read-only between calls
+_BASE_SUGGESTIONS = {
+    'PREDICTION_ERROR': (
+        'Check if all required input data is provided',
+        'Verify that marks are within valid ranges',
+        'Try again with different input values',
+        'Contact support if predictions consistently fail'
+    ),
+    'MODEL_ERROR': (
+        'The prediction model may be temporarily unavailable',
+        'Try again in a few minutes',
+        'Use manual calculation as a temporary alternative',
+        'Contact system administrator'
+    ),
+    'DATA_ERROR': (
+        'Check that all required fields are filled',
+        'Verify that numeric values are within expected ranges',
+        'Ensure data format matches requirements',
+        'Remove any special characters from input'
+    ),
+    'DATABASE_ERROR': (
+        'Check your internet connection',
+        'Try the operation again',
+        'Verify that referenced records exist',
+        'Contact support if database issues persist'
+    ),
+    'EXTERNAL_SERVICE_ERROR': (
+        'The external service may be temporarily unavailable',
+        'Check your network connection',
+        'Try again in a few minutes',
+        'Use alternative methods if available'
+    )
+}
+
+_DEFAULT_SUGGESTIONS = (
+    'Try the operation again',
+    'Check your input data',
+    'Contact support if the issue persists'
+)
+
+# Keywords in error details that add a leading suggestion; the lowest matched group wins
+_DETAIL_RE = re.compile(r'(timeout)|(memory)|(network)', re.IGNORECASE)
+_DETAIL_SUGGESTIONS = {
+    1: 'The operation timed out - try with smaller data sets',
+    2: 'Insufficient memory - try processing smaller batches',
+    3: 'Network issue detected - check your connection'
+}
+
+@lru_cache(maxsize=128)
+def _suggest(error_code: str, detail_group: Optional[int]) -> Tuple[str, ...]:
+    """Suggestions for an error code, led by the detail-specific one if any"""
+    suggestions = _BASE_SUGGESTIONS.get(error_code, _DEFAULT_SUGGESTIONS)
+    if detail_group is not None:
+        return (_DETAIL_SUGGESTIONS[detail_group],) + suggestions
+    return suggestions
 
 def get_recovery_suggestions(error_code: str, details: Dict = None) -> List[str]:
     """
     Generate recovery suggestions based on error type
     """
-    suggestions = []
-    
-    suggestion_map = {
-        'PREDICTION_ERROR': [
-            'Check if all required input data is provided',
-            'Verify that marks are within valid ranges',
-            'Try again with different input values',
-            'Contact support if predictions consistently fail'
-        ],
-        'MODEL_ERROR': [
-            'The prediction model may be temporarily unavailable',
-            'Try again in a few minutes',
-            'Use manual calculation as a temporary alternative',
-            'Contact system administrator'
-        ],
-        'DATA_ERROR': [
-            'Check that all required fields are filled',
-            'Verify that numeric values are within expected ranges',
-            'Ensure data format matches requirements',
-            'Remove any special characters from input'
-        ],
-        'DATABASE_ERROR': [
-            'Check your internet connection',
-            'Try the operation again',
-            'Verify that referenced records exist',
-            'Contact support if database issues persist'
-        ],
-        'EXTERNAL_SERVICE_ERROR': [
-            'The external service may be temporarily unavailable',
-            'Check your network connection',
-            'Try again in a few minutes',
-            'Use alternative methods if available'
-        ]
-    }
-    
-    suggestions = suggestion_map.get(error_code, [
-        'Try the operation again',
-        'Check your input data',
-        'Contact support if the issue persists'
-    ])
-    
     # Add specific suggestions based on error details
+    detail_group = None
     if details:
-        if 'timeout' in str(details).lower():
-            suggestions.insert(0, 'The operation timed out - try with smaller data sets')
-        elif 'memory' in str(details).lower():
-            suggestions.insert(0, 'Insufficient memory - try processing smaller batches')
-        elif 'network' in str(details).lower():
-            suggestions.insert(0, 'Network issue detected - check your connection')
+        matched = {match.lastindex for match in _DETAIL_RE.finditer(str(details))}
+        if matched:
+            detail_group = min(matched)
     
-    return suggestions
\ No newline at end of file
+    # Callers may extend the list, so hand out a copy of the cached tuple
+    return list(_suggest(error_code, detail_group))